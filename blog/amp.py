@@ -0,0 +1,38 @@
+"""
+Conversion of rendered blog post bodies to AMP HTML.
+"""
+from bs4 import BeautifulSoup
+
+# lxml's parser is much faster than Python's own, but optional
+try:
+    import lxml  # noqa: F401
+    AMP_PARSER = 'lxml'
+except ImportError:
+    AMP_PARSER = 'html.parser'
+
+
+def amp_html(body_html):
+    """
+    Rewrite HTML for AMP: images and iframes become amp-img and amp-iframe
+    elements, and embeds lose the padding set on their wrappers.
+    """
+    soup = BeautifulSoup(body_html, AMP_PARSER)
+
+    # Remove style attribute to remove large bottom padding
+    for div in soup.find_all('div', {'class': 'responsive-object'}):
+        del div['style']
+
+    # Change img tags to amp-img, which need a closing tag
+    for img_tag in soup.find_all('img'):
+        img_tag.name = 'amp-img'
+        img_tag.can_be_empty_element = False
+        img_tag['layout'] = 'responsive'
+
+    # Change iframe tags to amp-iframe
+    for iframe in soup.find_all('iframe'):
+        iframe.name = 'amp-iframe'
+        iframe['sandbox'] = 'allow-scripts allow-same-origin'
+        iframe['layout'] = 'responsive'
+
+    # lxml wraps fragments in <html><body>
+    return (soup.body or soup).decode_contents(formatter='html')
@@ -1,11 +1,14 @@
+from django.core.cache import cache
 from django.db import models
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.template.response import TemplateResponse
 from django.utils.safestring import mark_safe
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 
 from wagtail.core import blocks
 from wagtail.core.models import Page, Orderable
 from wagtail.core.fields import RichTextField, StreamField
+from wagtail.core.signals import page_published, page_unpublished
 from wagtailmarkdown.blocks import MarkdownBlock
 from wagtail.images.edit_handlers import ImageChooserPanel
 from wagtail.images.blocks import ImageChooserBlock
@@ -19,8 +22,13 @@ from wagtail.admin.edit_handlers import (
 from modelcluster.fields import ParentalKey
 from modelcluster.tags import ClusterTaggableManager
 from taggit.models import TaggedItemBase
-from bs4 import BeautifulSoup
 from utils.models import RelatedLink, CarouselItem
+from utils.facets import faceted_pages, selected_tags, tag_set_key
+from utils.fragments import cached_value, clear_fragments_on_commit
+from utils.pagination import paginate
+from .amp import amp_html
+
+AMP_CACHE_TIMEOUT = 60 * 60 * 24 * 7
 
 
 class BlogIndexPageRelatedLink(Orderable, RelatedLink):
@@ -54,24 +62,20 @@ class BlogIndexPage(Page):
         # Get blogs
         blogs = self.blogs
 
-        # Filter by tag
-        tag = request.GET.get('tag')
-        if tag:
-            blogs = blogs.filter(tags__name=tag)
-
-        # Pagination
-        page = request.GET.get('page')
-        paginator = Paginator(blogs, 10)  # Show 10 blogs per page
-        try:
-            blogs = paginator.page(page)
-        except PageNotAnInteger:
-            blogs = paginator.page(1)
-        except EmptyPage:
-            blogs = paginator.page(paginator.num_pages)
+        # Filter by tags
+        blogs, facets = faceted_pages(request, BlogPageTag, blogs, ['blog'], [self.pk])
+
+        # Pagination, 10 blogs per page
+        tags, match = selected_tags(request)
+        count = blogs.count
+        blogs = paginate(
+            request, blogs, ('-date', '-id'), 10,
+            count=lambda: cached_value(['blog'], 'blog_index_count', [self.pk, match, tag_set_key(tags)], count))
 
         # Update template context
         context = super(BlogIndexPage, self).get_context(request)
         context['blogs'] = blogs
+        context.update(facets)
         return context
 
 BlogIndexPage.content_panels = [
@@ -125,37 +129,42 @@ class BlogPage(RoutablePageMixin, Page):
 
     parent_page_types = ['blog.BlogIndexPage']
 
+    # Renders the body, when published, for the body_html tag
+    body_template = 'blog/includes/blog_body.html'
+
     @property
     def blog_index(self):
         # Find closest ancestor which is a blog index
         return self.get_ancestors().type(BlogIndexPage).last()
 
+    def get_cached_paths(self):
+        # Purge the AMP version from caches along with the page
+        return ['/', '/' + self.reverse_subpage('amp')]
+
     @route(r'^$')
     def normal_page(self, request):
         return Page.serve(self, request)
 
+    @property
+    def amp_body_html(self):
+        """
+        The body as AMP HTML. It's generated each time the page is published
+        (or on the first AMP request after) and then cached.
+        """
+        # Keyed on publication rather than revision, as publishing an
+        # existing revision (when scheduled, or approved in moderation)
+        # doesn't create a new one
+        cache_key = 'blog:amp_body:{0}:{1}'.format(self.pk, self.last_published_at)
+        body_html = cache.get(cache_key)
+        if body_html is None:
+            body_html = amp_html(self.body.__html__())
+            cache.set(cache_key, body_html, AMP_CACHE_TIMEOUT)
+        return mark_safe(body_html)
+
     @route(r'^amp/$')
     def amp(self, request):
         context = self.get_context(request)
-        body_html = self.body.__html__()
-        soup = BeautifulSoup(body_html, 'html.parser')
-        # Remove style attribute to remove large bottom padding
-        for div in soup.find_all("div", {'class': 'responsive-object'}):
-            del div['style']
-
-        # Change img tags to amp-img
-        for img_tag in soup.findAll('img'):
-            img_tag.name = 'amp-img'
-            img_tag.append(BeautifulSoup('</amp-img>', 'html.parser'))
-            img_tag['layout'] = 'responsive'
-
-        # Change iframe tags to amp-iframe
-        for iframe in soup.findAll('iframe'):
-            iframe.name = 'amp-iframe'
-            iframe['sandbox'] = 'allow-scripts allow-same-origin'
-            iframe['layout'] = 'responsive'
-
-        context['body_html'] = mark_safe(soup.prettify(formatter="html"))
+        context['body_html'] = self.amp_body_html
         context['is_amp'] = True
         context['base_template'] = 'amp_base.html'
         response = TemplateResponse(
@@ -177,3 +186,18 @@ BlogPage.promote_panels = Page.promote_panels + [
     ImageChooserPanel('feed_image'),
     FieldPanel('tags'),
 ]
+
+
+# Fragments showing posts (news_feed, more_news)
+
+@receiver(page_published, sender=BlogPage)
+@receiver(page_unpublished, sender=BlogPage)
+@receiver(post_delete, sender=BlogPage)
+def clear_blog_fragments(sender, **kwargs):
+    clear_fragments_on_commit('blog')
+
+
+@receiver(page_published, sender=BlogPage)
+def render_amp_body(sender, instance, **kwargs):
+    # Generate the AMP body now, rather than on the first AMP request
+    instance.amp_body_html
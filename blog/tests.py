@@ -12,3 +12,6 @@ class BlogPageTests(WagtailPageTests):
     def test_cant_create_under_home_page(self):
         # You can not create a BlogPage under HomePage
         self.assertCanNotCreateAt(HomePage, BlogPage)
+
+    def test_amp_page_is_purged_with_page(self):
+        self.assertEqual(BlogPage().get_cached_paths(), ['/', '/amp/'])
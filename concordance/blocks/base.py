@@ -9,3 +9,7 @@ STYLE_CHOICES = [
 
 class BaseCharacteristicsBlock(blocks.StructBlock):
     style = blocks.ChoiceBlock(choices=STYLE_CHOICES, default='default')
+
+    class Meta:
+        # Shows the page's current properties, so isn't prerendered
+        dynamic = True
@@ -25,3 +25,4 @@ class OrbitalMechanicsOrbiterBlock(blocks.StructBlock):
 
     class Meta:
         template = 'blocks/orbital_mechanics_orbiter_block.html'
+        dynamic = True
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from concordance.models import StarPage, load_bodies_beneath
+from concordance.models.properties import store_catalogue_fields
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the stored catalogue values of every star, planet and moon'
+
+    def handle(self, **options):
+        for star in StarPage.objects.all():
+            store_catalogue_fields([star] + load_bodies_beneath(star))
@@ -0,0 +1,25 @@
+# Generated by Django 2.0.8 on 2018-09-03 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailcore', '0040_page_draft_title'),
+        ('concordance', '0007_auto_20180901_0112'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrreryScenario',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scenario', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('revision', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='wagtailcore.PageRevision')),
+                ('star', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='orrery_scenario', to='concordance.StarPage')),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.0.8 on 2018-09-04 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('concordance', '0008_orreryscenario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='planetpage',
+            name='catalogue_mean_surface_temperature',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Mean surface temperature (K)', null=True),
+        ),
+        migrations.AddField(
+            model_name='planetpage',
+            name='catalogue_orbital_period',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Orbital period (s)', null=True),
+        ),
+        migrations.AddField(
+            model_name='planetpage',
+            name='catalogue_surface_gravity',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Surface gravity (m s^-2)', null=True),
+        ),
+        migrations.AddField(
+            model_name='starpage',
+            name='catalogue_luminosity',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Luminosity (W)', null=True),
+        ),
+        migrations.AddField(
+            model_name='starpage',
+            name='catalogue_spectral_class',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=16, null=True),
+        ),
+    ]
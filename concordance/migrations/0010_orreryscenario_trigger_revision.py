@@ -0,0 +1,18 @@
+# Generated by Django 2.0.8 on 2018-09-20 11:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('concordance', '0009_catalogue_fields'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='orreryscenario',
+            old_name='revision',
+            new_name='trigger_revision',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.0.8 on 2018-09-21 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('concordance', '0010_orreryscenario_trigger_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='planetpage',
+            name='sky_textures',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
@@ -1,2 +1,3 @@
 from .stars import *
 from .planetary_bodies import *
+from .orrery import *
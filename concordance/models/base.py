@@ -12,3 +12,19 @@ COMMON_BLOCKS = [
 
 GRAVITATIONAL_CONSTANT = Q_('6.67408e-11 * m**3 * kg**-1 * s**-2')
 STEFAN_CONSTANT = Q_(5.670367e-8, ureg.watt * ureg.meter**-2 * ureg.kelvin**-4)
+
+# The constants above, and the reference values the models scale from, as
+# plain floats in SI base units for the unit-free calculations.
+GRAVITATIONAL_CONSTANT_SI = GRAVITATIONAL_CONSTANT.to_base_units().magnitude
+STEFAN_CONSTANT_SI = STEFAN_CONSTANT.to_base_units().magnitude
+
+ASTRONOMICAL_UNIT = Q_(1, ureg.au).to(ureg.meter).magnitude
+SOLAR_MASS = Q_(1, ureg.solar_mass).to(ureg.kilogram).magnitude
+SOLAR_RADIUS = Q_(1, ureg.solar_radius).to(ureg.meter).magnitude
+SOLAR_LUMINOSITY = Q_(1, ureg.solar_luminosity).to(ureg.watt).magnitude
+SOLAR_LIFETIME = Q_(1, ureg.solar_lifetime).to(ureg.second).magnitude
+SOLAR_SURFACE_TEMPERATURE = Q_(1, ureg.solar_surface_temperature).to(ureg.kelvin).magnitude
+EARTH_MASS = Q_(1, ureg.earth_mass).to(ureg.kilogram).magnitude
+EARTH_RADIUS = Q_(1, ureg.earth_radius).to(ureg.meter).magnitude
+JOVIAN_MASS = Q_(1, ureg.jovian_mass).to(ureg.kilogram).magnitude
+JOVIAN_RADIUS = Q_(1, ureg.jovian_radius).to(ureg.meter).magnitude
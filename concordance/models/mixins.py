@@ -10,7 +10,11 @@ from quantity_field import ureg
 from quantity_field.fields import MultiQuantityField
 Q_ = ureg.Quantity
 
-from .base import COMMON_BLOCKS, GRAVITATIONAL_CONSTANT, STEFAN_CONSTANT
+from .base import (
+    COMMON_BLOCKS, GRAVITATIONAL_CONSTANT_SI, STEFAN_CONSTANT_SI, EARTH_MASS, EARTH_RADIUS, JOVIAN_MASS, JOVIAN_RADIUS
+)
+from .properties import derived_property, si_field, si_quantity
+from ..physics import ephemeris, insolation
 
 import math
 
@@ -33,6 +37,9 @@ class ConcordanceEntryMixin(models.Model):
 
     body = StreamField(COMMON_BLOCKS)
 
+    # Renders the body, when published, for the body_html tag
+    body_template = 'concordance/includes/body.html'
+
     content_panels = Page.content_panels + [
         ImageChooserPanel('hero_image'),
         FieldPanel('subtitle'),
@@ -65,39 +72,89 @@ class OrbitalMechanicsMixin(models.Model):
     def orbited_object(self):
         return self.get_parent().specific
 
-    @property
-    def periapsis(self):
-        return self.semi_major_axis * (1 - float(self.eccentricity))
+    # The fields as plain SI floats; the properties below do their physics on
+    # these and only wrap the results back up as quantities for templates.
+    semi_major_axis_si = si_field('semi_major_axis', ureg.meter)
+    inclination_si = si_field('inclination', ureg.radian)
+    longitude_of_the_ascending_node_si = si_field('longitude_of_the_ascending_node', ureg.radian)
+    argument_of_periapsis_si = si_field('argument_of_periapsis', ureg.radian)
+    rotational_period_si = si_field('rotational_period', ureg.second)
+    obliquity_si = si_field('obliquity', ureg.radian)
+
+    @derived_property('eccentricity')
+    def eccentricity_si(self):
+        return float(self.eccentricity)
+
+    @derived_property('semi_major_axis_si', 'eccentricity_si')
+    def periapsis_si(self):
+        return self.semi_major_axis_si * (1 - self.eccentricity_si)
+
+    @derived_property('semi_major_axis_si', 'eccentricity_si')
+    def apoapsis_si(self):
+        return self.semi_major_axis_si * (1 + self.eccentricity_si)
+
+    @derived_property('semi_major_axis_si', 'orbited_object.mass_si')
+    def orbital_period_si(self):
+        mu = GRAVITATIONAL_CONSTANT_SI * self.orbited_object.mass_si
+        return ((4 * math.pi**2) / mu * self.semi_major_axis_si**3)**0.5
+
+    @derived_property('longitude_of_the_ascending_node_si', 'argument_of_periapsis_si')
+    def longitude_of_periapsis_si(self):
+        return self.longitude_of_the_ascending_node_si + self.argument_of_periapsis_si
+
+    @derived_property('orbital_period_si', 'rotational_period_si')
+    def local_days_in_year_si(self):
+        return self.orbital_period_si / self.rotational_period_si
+
+    @derived_property('obliquity_si')
+    def polar_circles_si(self):
+        return math.pi / 2 - self.obliquity_si
+
+    periapsis = si_quantity('periapsis_si', ureg.meter)
+    apoapsis = si_quantity('apoapsis_si', ureg.meter)
+    orbital_period = si_quantity('orbital_period_si', ureg.second)
+    longitude_of_periapsis = si_quantity('longitude_of_periapsis_si', ureg.radian)
+    local_days_in_year = si_quantity('local_days_in_year_si', ureg.dimensionless)
+    polar_circles = si_quantity('polar_circles_si', ureg.radian)
+
+    @derived_property('semi_major_axis_si', 'eccentricity_si', 'inclination_si', 'longitude_of_the_ascending_node_si',
+                      'argument_of_periapsis_si', 'orbited_object.mass_si')
+    def orbital_elements(self):
+        """
+        The Keplerian elements of this orbit as plain floats in SI units, in
+        the form taken by the ephemeris engine.
 
-    @property
-    def apoapsis(self):
-        return self.semi_major_axis * (1+ float(self.eccentricity))
+        As in the orrery, the mean longitude at the epoch is taken to be 0.
+        """
+        return {
+            'semi_major_axis': self.semi_major_axis_si,
+            'eccentricity': self.eccentricity_si,
+            'inclination': self.inclination_si,
+            'longitude_of_the_ascending_node': self.longitude_of_the_ascending_node_si,
+            'argument_of_periapsis': self.argument_of_periapsis_si,
+            'mean_anomaly_at_epoch': -self.longitude_of_periapsis_si,
+            'gravitational_parameter': GRAVITATIONAL_CONSTANT_SI * self.orbited_object.mass_si,
+        }
 
-    @property
-    def orbital_period(self):
-        return (((4 * math.pi**2) / (GRAVITATIONAL_CONSTANT * self.orbited_object.mass)) * self.semi_major_axis**3)**0.5
+    def orbital_state(self, times):
+        """
+        Calculate the position and velocity of this body, relative to the
+        object it orbits, at each of the given times since the epoch.
 
-    @property
-    def longitude_of_periapsis(self):
-        return self.longitude_of_the_ascending_node + self.argument_of_periapsis
+        Returns a pair of quantity arrays of shape (len(times), 3).
+        """
+        positions, velocities = ephemeris.propagate(times=times.to(ureg.second).magnitude, **self.orbital_elements)
+        return Q_(positions[0], ureg.meter), Q_(velocities[0], ureg.meter / ureg.second)
 
 
     @property
     def day_length(self):
         return self.rotational_period
 
-    @property
-    def local_days_in_year(self):
-        return self.orbital_period / self.rotational_period
-
     @property
     def tropics(self):
         return self.obliquity
 
-    @property
-    def polar_circles(self):
-        return Q_('90 degree') - self.obliquity
-
     content_panels = [MultiFieldPanel([
             FieldRowPanel([
                 FieldPanel('semi_major_axis'),
@@ -128,92 +185,112 @@ class PlanetaryBodyMixin(OrbitalMechanicsMixin):
     mass = MultiQuantityField(units=(ureg.earth_mass, ureg.jovian_mass, ureg.kilogram))
     radius = MultiQuantityField(units=(ureg.earth_radius, ureg.jovian_radius, ureg.km, ureg.mile, ureg.m))
 
-    @property
+    mass_si = si_field('mass', ureg.kilogram)
+    radius_si = si_field('radius', ureg.meter)
+
+    @derived_property('mass_si')
     def mass_is_jovian(self):
-        return self.mass.to("jovian_mass").magnitude > 0.1
+        return self.mass_si > 0.1 * JOVIAN_MASS
 
-    @property
+    @derived_property('mass_si')
     def mass_is_terran(self):
-        return self.mass.to("earth_mass").magnitude > 0.001
+        return self.mass_si > 0.001 * EARTH_MASS
 
-    @property
+    @derived_property('radius_si')
     def radius_is_jovian(self):
-        return self.radius.to("jovian_radius").magnitude > 0.1
+        return self.radius_si > 0.1 * JOVIAN_RADIUS
 
-    @property
+    @derived_property('radius_si')
     def radius_is_terran(self):
-        return self.radius.to("earth_radius").magnitude > 0.001
+        return self.radius_si > 0.001 * EARTH_RADIUS
 
-    @property
-    def surface_gravity(self):
-        return GRAVITATIONAL_CONSTANT * self.mass / self.radius**2
-
-    @property
-    def density(self):
-        return self.mass / ((4/3) * math.pi * self.radius**3)
+    @derived_property('mass_si', 'radius_si')
+    def surface_gravity_si(self):
+        return GRAVITATIONAL_CONSTANT_SI * self.mass_si / self.radius_si**2
 
-    @property
-    def escape_velocity(self):
-        return (2 * GRAVITATIONAL_CONSTANT * self.mass / self.radius)**0.5
+    @derived_property('mass_si', 'radius_si')
+    def density_si(self):
+        return self.mass_si / ((4/3) * math.pi * self.radius_si**3)
 
-    @property
-    def mean_surface_temperature(self):
-        a_c = math.pi * self.radius**2
-        a_e = 4 * math.pi * self.radius**2
-        return ((self.solar_constant * a_c)/(STEFAN_CONSTANT * a_e))**0.25
-        # return self.orbited_object.luminosity**0.25 / self.semi_major_axis**2
+    @derived_property('mass_si', 'radius_si')
+    def escape_velocity_si(self):
+        return (2 * GRAVITATIONAL_CONSTANT_SI * self.mass_si / self.radius_si)**0.5
 
-    @property
-    def solar_constant(self):
-        return self.orbited_object.luminosity / (4 * math.pi * self.semi_major_axis ** 2)
+    @derived_property('solar_constant_si')
+    def mean_surface_temperature_si(self):
+        # The body absorbs over its cross-section (pi r^2) and radiates over
+        # its whole surface (4 pi r^2)
+        return (self.solar_constant_si / (4 * STEFAN_CONSTANT_SI))**0.25
 
     @property
+    def star_orbit(self):
+        """
+        The body whose orbit is around the star lighting this one: the body
+        itself, or for a moon, the planet it (eventually) orbits.
+        """
+        body = self
+        while isinstance(body.orbited_object, PlanetaryBodyMixin):
+            body = body.orbited_object
+        return body
+
+    @derived_property('star_orbit.orbited_object.luminosity_si', 'star_orbit.semi_major_axis_si')
+    def solar_constant_si(self):
+        # Moons are taken to be as far from the star as their planet
+        planet = self.star_orbit
+        return planet.orbited_object.luminosity_si / (4 * math.pi * planet.semi_major_axis_si**2)
+
+    surface_gravity = si_quantity('surface_gravity_si', ureg.meter / ureg.second**2)
+    density = si_quantity('density_si', ureg.kilogram / ureg.meter**3)
+    escape_velocity = si_quantity('escape_velocity_si', ureg.meter / ureg.second)
+    mean_surface_temperature = si_quantity('mean_surface_temperature_si', ureg.kelvin)
+    solar_constant = si_quantity('solar_constant_si', ureg.watt / ureg.meter**2)
+
+    @derived_property('solar_constant_si', 'obliquity_si', 'eccentricity_si', 'longitude_of_periapsis_si')
     def seasonal_insolation(self):
+        tropics = math.degrees(self.obliquity_si)
+        polar_circles = math.degrees(self.polar_circles_si)
+        latitudes = [
+            ('equator', 0),
+            ('north_tropic', tropics),
+            ('north_polar_circle', polar_circles),
+            ('north_pole', 90),
+            ('south_tropic', -tropics),
+            ('south_polar_circle', -polar_circles),
+            ('south_pole', -90),
+        ]
+        seasons = [
+            ('vernal_equinox', 0),
+            ('summer_solstice', 90),
+            ('autumnal_equinox', 180),
+            ('winter_solstice', 270),
+        ]
+        grid = self.insolation_grid(
+            Q_([latitude for _, latitude in latitudes], ureg.degree),
+            Q_([true_anomaly for _, true_anomaly in seasons], ureg.degree),
+        )
         return {
-            'equator': {
-                'vernal_equinox': self.surface_insolation(Q_(0, ureg.degree), Q_(0, ureg.degree)),
-                'summer_solstice': self.surface_insolation(Q_(0, ureg.degree), Q_(90, ureg.degree)),
-                'autumnal_equinox': self.surface_insolation(Q_(0, ureg.degree), Q_(180, ureg.degree)),
-                'winter_solstice': self.surface_insolation(Q_(0, ureg.degree), Q_(270, ureg.degree))
-            },
-            'north_tropic': {
-                'vernal_equinox': self.surface_insolation(self.tropics, Q_(0, ureg.degree)),
-                'summer_solstice': self.surface_insolation(self.tropics, Q_(90, ureg.degree)),
-                'autumnal_equinox': self.surface_insolation(self.tropics, Q_(180, ureg.degree)),
-                'winter_solstice': self.surface_insolation(self.tropics, Q_(270, ureg.degree))
-            },
-            'north_polar_circle': {
-                'vernal_equinox': self.surface_insolation(self.polar_circles, Q_(0, ureg.degree)),
-                'summer_solstice': self.surface_insolation(self.polar_circles, Q_(90, ureg.degree)),
-                'autumnal_equinox': self.surface_insolation(self.polar_circles, Q_(180, ureg.degree)),
-                'winter_solstice': self.surface_insolation(self.polar_circles, Q_(270, ureg.degree))
-            },
-            'north_pole': {
-                'vernal_equinox': self.surface_insolation(Q_(90, ureg.degree), Q_(0, ureg.degree)),
-                'summer_solstice': self.surface_insolation(Q_(90, ureg.degree), Q_(90, ureg.degree)),
-                'autumnal_equinox': self.surface_insolation(Q_(90, ureg.degree), Q_(180, ureg.degree)),
-                'winter_solstice': self.surface_insolation(Q_(90, ureg.degree), Q_(270, ureg.degree))
-            },
-            'south_tropic': {
-                'vernal_equinox': self.surface_insolation(-self.tropics, Q_(0, ureg.degree)),
-                'summer_solstice': self.surface_insolation(-self.tropics, Q_(90, ureg.degree)),
-                'autumnal_equinox': self.surface_insolation(-self.tropics, Q_(180, ureg.degree)),
-                'winter_solstice': self.surface_insolation(-self.tropics, Q_(270, ureg.degree))
-            },
-            'south_polar_circle': {
-                'vernal_equinox': self.surface_insolation(-self.polar_circles, Q_(0, ureg.degree)),
-                'summer_solstice': self.surface_insolation(-self.polar_circles, Q_(90, ureg.degree)),
-                'autumnal_equinox': self.surface_insolation(-self.polar_circles, Q_(180, ureg.degree)),
-                'winter_solstice': self.surface_insolation(-self.polar_circles, Q_(270, ureg.degree))
-            },
-            'south_pole': {
-                'vernal_equinox': self.surface_insolation(Q_(-90, ureg.degree), Q_(0, ureg.degree)),
-                'summer_solstice': self.surface_insolation(Q_(-90, ureg.degree), Q_(90, ureg.degree)),
-                'autumnal_equinox': self.surface_insolation(Q_(-90, ureg.degree), Q_(180, ureg.degree)),
-                'winter_solstice': self.surface_insolation(Q_(-90, ureg.degree), Q_(270, ureg.degree))
-            }
+            latitude_name: {
+                season_name: grid[i, j] for j, (season_name, _) in enumerate(seasons)
+            } for i, (latitude_name, _) in enumerate(latitudes)
         }
 
+    def insolation_grid(self, latitudes, true_anomalies):
+        """
+        Calculate the surface insolation for every combination of the given
+        latitudes and true anomalies (both angle quantities) in one pass.
+
+        Returns a quantity array of shape (len(latitudes), len(true_anomalies)),
+        suitable for a full latitude by orbit-phase heatmap.
+        """
+        return Q_(insolation.insolation_grid(
+            self.solar_constant_si,
+            self.obliquity_si,
+            self.eccentricity_si,
+            self.longitude_of_periapsis_si,
+            latitudes.to(ureg.radian).magnitude,
+            true_anomalies.to(ureg.radian).magnitude,
+        ), ureg.watt / ureg.meter**2)
+
     def declination(self, true_anomaly):
         """
         Calculates the declination at a given point in the orbit.
@@ -0,0 +1,64 @@
+import json
+
+from django.db import models
+from django.dispatch import receiver
+
+from wagtail.core.signals import page_published, page_unpublished
+
+from .planetary_bodies import PlanetPage
+from .stars import StarPage
+
+
+class OrreryScenario(models.Model):
+    """
+    The orrery scenario for a star system, stored as JSON so the orrery can
+    load it without walking the tree and converting every quantity again.
+
+    It is rebuilt whenever the star or one of its planets or moons is
+    published or unpublished. trigger_revision is the revision (of the star,
+    or of whichever planet or moon it was) whose publication last rebuilt
+    it.
+    """
+
+    star = models.OneToOneField(
+        'concordance.StarPage',
+        on_delete=models.CASCADE,
+        related_name='orrery_scenario'
+    )
+    trigger_revision = models.ForeignKey(
+        'wagtailcore.PageRevision',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+    scenario = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def build(cls, star, trigger_revision=None):
+        """
+        Render the scenario for a star and store it, replacing any existing one.
+        """
+        orrery_scenario, _ = cls.objects.update_or_create(star=star, defaults={
+            'trigger_revision': trigger_revision,
+            'scenario': json.dumps(star.to_orrery_scenario),
+        })
+        return orrery_scenario
+
+    def __str__(self):
+        return "Orrery scenario for " + self.star.title
+
+
+@receiver(page_published, sender=StarPage)
+@receiver(page_published, sender=PlanetPage)
+@receiver(page_unpublished, sender=StarPage)
+@receiver(page_unpublished, sender=PlanetPage)
+def rebuild_orrery_scenario(sender, instance, **kwargs):
+    if isinstance(instance, StarPage):
+        star = instance
+    else:
+        star = StarPage.objects.ancestor_of(instance).last()
+
+    if star is not None:
+        OrreryScenario.build(star, kwargs.get('revision'))
@@ -1,8 +1,14 @@
-from django.db import models
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models import Prefetch
+from django.dispatch import receiver
 from django.forms import widgets
 
 from wagtail.core.models import Page, Orderable
 from wagtail.core.fields import StreamField
+from wagtail.core.signals import page_published
 from wagtail.admin.edit_handlers import FieldPanel, FieldRowPanel, MultiFieldPanel, InlinePanel
 from wagtail.snippets.models import register_snippet
 from wagtail.snippets.edit_handlers import SnippetChooserPanel
@@ -15,13 +21,43 @@ Q_ = ureg.Quantity
 
 from .base import COMMON_BLOCKS
 from .mixins import ConcordanceEntryMixin, PlanetaryBodyMixin
+from .properties import derived_property, si_field, si_quantity, update_catalogue_fields, store_catalogue_fields
+from ..physics import atmosphere, sky
+from ..tasks import render_sky_textures
 from ..blocks import OrbitalMechanicsOrbitalCharacteristicsBlock, OrbitalMechanicsRotationalCharacteristicsBlock, PlanetaryBodyPhysicalCharacteristicsBlock, PlanetaryBodySeasonalCharacteristicsBlock, PlanetaryBodySkySimulationBlock
 
 AVOGADRO_CONSTANT = Q_(6.022140857e23, ureg.mol**-1)
 GAS_CONSTANT = Q_(8.3144598, ureg.joule * ureg.mol**-1 * ureg.kelvin**-1)
 
+AVOGADRO_CONSTANT_SI = AVOGADRO_CONSTANT.magnitude
+GAS_CONSTANT_SI = GAS_CONSTANT.magnitude
+# Roughly the pressure of Earth's atmosphere at 100km, in Pa
+EDGE_OF_SPACE_PRESSURE = Q_(6E-6, ureg.atm).to(ureg.pascal).magnitude
+SECONDS_PER_DAY = Q_(1, ureg.day).to(ureg.second).magnitude
+ATMOSPHERIC_PROFILE_CACHE_TIMEOUT = 60 * 60 * 24
+# The heights shown in the physical characteristics block's profile table
+ATMOSPHERIC_PROFILE_ROWS = 6
+
+# The scenes shown by the sky simulation: name, title and sun angle
+SKY_SIMULATION_SCENES = [
+    ('day', 'Day', 0),
+    ('sunset', 'Sunrise/sunset', 2.0944),
+    ('dusk', 'Dusk', 2.44346),
+]
+# The size of the simulator's canvas
+SKY_SIMULATION_SIZE = 512
+# Pre-rendered skies are small and scaled up by the browser; the gradients
+# are smooth enough not to need more
+SKY_TEXTURE_SIZE = 128
+
+from io import BytesIO
+import hashlib
+import json
 import math
 
+import numpy as np
+from PIL import Image as PILImage
+
 def is_number(s):
     try:
         float(s)
@@ -161,35 +197,82 @@ class PlanetPage(ConcordanceEntryMixin, PlanetaryBodyMixin, Page):
     # Atmospheric modelling
     surface_pressure = MultiQuantityField(default=0, units=(ureg.atm, ureg.pascal, ureg.bar))
 
-    @property
+    # Derived values stored in SI units, so catalogues can filter and sort
+    # on them in the database. These are recalculated on every save.
+    catalogue_surface_gravity = models.FloatField(
+        null=True, blank=True, editable=False, db_index=True, help_text="Surface gravity (m s^-2)")
+    catalogue_mean_surface_temperature = models.FloatField(
+        null=True, blank=True, editable=False, db_index=True, help_text="Mean surface temperature (K)")
+    catalogue_orbital_period = models.FloatField(
+        null=True, blank=True, editable=False, db_index=True, help_text="Orbital period (s)")
+
+    # The URLs of the pre-rendered sky simulation scenes, as JSON keyed by
+    # scene name. These are rendered by a task after each publish.
+    sky_textures = models.TextField(blank=True, editable=False)
+
+    catalogue_fields = {
+        'catalogue_surface_gravity': ('surface_gravity_si', None),
+        'catalogue_mean_surface_temperature': ('mean_surface_temperature_si', None),
+        'catalogue_orbital_period': ('orbital_period_si', None),
+    }
+
+    def save(self, *args, **kwargs):
+        # Saves that only touch a few columns (e.g. saving a draft revision)
+        # leave the live values alone.
+        full_save = kwargs.get('update_fields') is None
+        if full_save:
+            update_catalogue_fields(self)
+        super(PlanetPage, self).save(*args, **kwargs)
+        if full_save:
+            # Moons depend on the mass of the planet they orbit
+            store_catalogue_fields(load_bodies_beneath(self))
+
+    @derived_property()
     def refractive_index(self):
         """
         Calculate the refractive index of this atmosphere based on the
         component gasses and their proportions.
+
+        The components are read once per instance; call
+        clear_derived_properties() after editing them in place.
         """
-        return sum(atmospheric_component.percentage/100 * atmospheric_component.atmospheric_gas.refractive_index for atmospheric_component in self.atmospheric_components.all())
+        return sum(
+            atmospheric_component.percentage/100 * atmospheric_component.atmospheric_gas.refractive_index
+            for atmospheric_component in self.atmospheric_components.all())
 
-    @property
-    def scale_height(self):
+    surface_pressure_si = si_field('surface_pressure', ureg.pascal)
+
+    @derived_property('mean_surface_temperature_si', 'atmospheric_weight_si', 'surface_gravity_si')
+    def scale_height_si(self):
         """
         Calculate the scale height for this atmosphere.
         """
-        return (GAS_CONSTANT * self.mean_surface_temperature)/(self.atmospheric_weight * self.surface_gravity)
+        return (
+            (GAS_CONSTANT_SI * self.mean_surface_temperature_si)
+            / (self.atmospheric_weight_si * self.surface_gravity_si))
 
     def atmospheric_density(self, height):
         """
         Give the density of the atmosphere at a given height.
         """
-        return (self.atmospheric_pressure(height) * self.atmospheric_weight)/(GAS_CONSTANT * self.mean_surface_temperature)
+        return Q_(self._atmospheric_density(height.to(ureg.meter).magnitude), ureg.kilogram / ureg.meter**3)
+
+    def _atmospheric_density(self, height):
+        return (
+            (self._atmospheric_pressure(height) * self.atmospheric_weight_si)
+            / (GAS_CONSTANT_SI * self.mean_surface_temperature_si))
 
     def atmospheric_pressure(self, height):
         """
         Give the pressure of the atmosphere at a given height.
         """
-        return self.surface_pressure * math.exp(-height/self.scale_height)
+        return Q_(self._atmospheric_pressure(height.to(ureg.meter).magnitude), ureg.pascal)
 
-    @property
-    def atmospheric_depth(self):
+    def _atmospheric_pressure(self, height):
+        return self.surface_pressure_si * math.exp(-height/self.scale_height_si)
+
+    @derived_property('scale_height_si', 'surface_pressure_si')
+    def atmospheric_depth_si(self):
         """
         Give a (slightly arbitrary) measure of the depth of the atmosphere.
 
@@ -199,17 +282,20 @@ class PlanetPage(ConcordanceEntryMixin, PlanetaryBodyMixin, Page):
         P = P0 * Exp(- h/H)
         h = -H * ln(Ps/P0)
         """
-        return -self.scale_height * math.log(Q_(6E-6, ureg.atm) / self.surface_pressure)
+        return -self.scale_height_si * math.log(EDGE_OF_SPACE_PRESSURE / self.surface_pressure_si)
 
     def molecular_number_density(self, height):
         """
         The number of molecules per unit volume at a given height.
         """
-        return AVOGADRO_CONSTANT * self.atmospheric_density(height) / self.atmospheric_weight
+        return Q_(self._molecular_number_density(height.to(ureg.meter).magnitude), ureg.meter**-3)
 
-    @property
-    def surface_molecular_number_density(self):
-        return self.molecular_number_density(Q_(0, ureg.m))
+    def _molecular_number_density(self, height):
+        return AVOGADRO_CONSTANT_SI * self._atmospheric_density(height) / self.atmospheric_weight_si
+
+    @derived_property('surface_pressure_si', 'scale_height_si', 'atmospheric_weight_si', 'mean_surface_temperature_si')
+    def surface_molecular_number_density_si(self):
+        return self._molecular_number_density(0)
 
     def rayleigh_scattering_coefficient(self, wavelength):
         """
@@ -222,26 +308,155 @@ class PlanetPage(ConcordanceEntryMixin, PlanetaryBodyMixin, Page):
 
         (8 * math.pi**3 * (n**2 - 1)**2)/3 * 1/N * 1/wavelength**4
         """
-        return 8 * math.pi**3 * (self.refractive_index**2 - 1)**2/3 * 1/self.surface_molecular_number_density * 1/wavelength**4
+        return Q_(self._rayleigh_scattering_coefficient(wavelength.to(ureg.meter).magnitude), ureg.meter**-1)
 
-    @property
+    def _rayleigh_scattering_coefficient(self, wavelength):
+        return (
+            8 * math.pi**3 * (self.refractive_index**2 - 1)**2/3
+            * 1/self.surface_molecular_number_density_si * 1/wavelength**4)
+
+    @derived_property('refractive_index', 'surface_molecular_number_density_si')
     def rayleigh_scattering_coefficients(self):
         """
         Return the scattering coefficients for red (680nm), green (550nm), and
         blue (440nm) light.
         """
         return {
-            'red': self.rayleigh_scattering_coefficient(Q_('680 nanometer')),
-            'green': self.rayleigh_scattering_coefficient(Q_('550 nanometer')),
-            'blue': self.rayleigh_scattering_coefficient(Q_('440 nanometer')),
+            colour: Q_(self._rayleigh_scattering_coefficient(wavelength), ureg.meter**-1)
+            for colour, wavelength in (('red', 680e-9), ('green', 550e-9), ('blue', 440e-9))
         }
 
+    @derived_property('rayleigh_scattering_coefficients', 'scale_height_si', 'atmospheric_depth_si', 'radius_si')
+    def sky_simulation_params(self):
+        """
+        The parameters shared by every scene of the sky simulation, in the
+        form the simulator script takes.
+        """
+        coefficients = self.rayleigh_scattering_coefficients
+        return {
+            'rayleighCoefficients': {
+                colour: coefficients[colour].magnitude for colour in ('red', 'green', 'blue')
+            },
+            'scaleHeight': self.scale_height_si,
+            'atmosphereDepth': self.atmospheric_depth_si,
+            'planetRadius': self.radius_si,
+            'starIntensity': 1,
+            'starColor': {'red': 1.0, 'green': 1.0, 'blue': 1.0},
+        }
+
+    @derived_property('sky_simulation_params', 'sky_textures')
+    def sky_simulation_scenes(self):
+        """
+        Each scene of the sky simulation, with its parameters for the
+        simulator script and the URL of its pre-rendered texture for clients
+        that can't run the simulator (None until the textures have been
+        rendered).
+        """
+        texture_urls = json.loads(self.sky_textures or '{}')
+        return [{
+            'name': name,
+            'title': title,
+            'star_angle': star_angle,
+            'params': dict(
+                self.sky_simulation_params, width=SKY_SIMULATION_SIZE, height=SKY_SIMULATION_SIZE,
+                starAngle=star_angle),
+            'texture_url': texture_urls.get(name),
+        } for name, title, star_angle in SKY_SIMULATION_SCENES]
+
     @property
-    def atmospheric_weight(self):
+    def has_atmosphere(self):
         """
-        The mass of the atmosphere per mole
+        Whether this body has an atmosphere to scatter light and profile.
         """
-        return sum(atmospheric_component.percentage/100 * atmospheric_component.atmospheric_gas.molar_weight for atmospheric_component in self.atmospheric_components.all())
+        return self.surface_pressure_si > 0 and self.atmospheric_weight_si > 0
+
+    @property
+    def has_sky_simulation(self):
+        """
+        Whether this body shows a sky simulation: it needs an atmosphere and
+        a sky_simulation block in its body.
+        """
+        return self.has_atmosphere and any(child.block_type == 'sky_simulation' for child in self.body)
+
+    def store_sky_textures(self):
+        """
+        Render the sky simulation scenes for the current atmosphere, scattering
+        light by its vertical profile, and store their URLs without going
+        through a full save().
+        """
+        profile = self.atmospheric_profile()
+        density_profile = (
+            profile['height'], profile['molecular_number_density'] / profile['molecular_number_density'][0])
+        self.sky_textures = json.dumps({
+            name: sky_texture_url(self.sky_simulation_params, star_angle, density_profile)
+            for name, _, star_angle in SKY_SIMULATION_SCENES
+        })
+        PlanetPage.objects.filter(pk=self.pk).update(sky_textures=self.sky_textures)
+
+    @derived_property()
+    def atmospheric_weight_si(self):
+        """
+        The mass of the atmosphere per mole, in kg/mol.
+
+        Like refractive_index, this is read once per instance.
+        """
+        return sum(
+            atmospheric_component.percentage/100
+            * atmospheric_component.atmospheric_gas.molar_weight.to(ureg.kilogram / ureg.mol).magnitude
+            for atmospheric_component in self.atmospheric_components.all())
+
+    def atmospheric_profile(self, samples=100):
+        """
+        The pressure, density and molecular number density of the atmosphere
+        at evenly spaced heights from the surface up to atmospheric_depth.
+
+        Returns a dict of NumPy arrays in SI units, keyed by 'height',
+        'pressure', 'density' and 'molecular_number_density'. Published
+        pages' profiles are cached until the page, the planet it belongs to or
+        their star (which sets its temperature) is next published; drafts are
+        always calculated afresh.
+        """
+        cache_key = None
+        if self.pk is not None and self.live and not self.has_unpublished_changes:
+            star_orbit = self.star_orbit
+            cache_key = 'concordance:atmospheric_profile:{0}:{1}:{2}:{3}:{4}'.format(
+                self.pk, self.last_published_at, star_orbit.last_published_at,
+                star_orbit.orbited_object.last_published_at, samples)
+            profile = cache.get(cache_key)
+            if profile is not None:
+                return profile
+
+        profile = atmosphere.vertical_profile(
+            self.surface_pressure_si,
+            self.scale_height_si,
+            self.atmospheric_weight_si,
+            self.mean_surface_temperature_si,
+            GAS_CONSTANT_SI,
+            AVOGADRO_CONSTANT_SI,
+            np.linspace(0, self.atmospheric_depth_si, samples),
+        )
+        if cache_key is not None:
+            cache.set(cache_key, profile, ATMOSPHERIC_PROFILE_CACHE_TIMEOUT)
+        return profile
+
+    @property
+    def atmospheric_profile_rows(self):
+        """
+        The atmospheric profile at a few heights, as quantities for the
+        physical characteristics block's table.
+        """
+        profile = self.atmospheric_profile(samples=ATMOSPHERIC_PROFILE_ROWS)
+        return [{
+            'height': Q_(profile['height'][i], ureg.meter),
+            'pressure': Q_(profile['pressure'][i], ureg.pascal),
+            'density': Q_(profile['density'][i], ureg.kilogram / ureg.meter**3),
+            'molecular_number_density': Q_(profile['molecular_number_density'][i], ureg.meter**-3),
+        } for i in range(ATMOSPHERIC_PROFILE_ROWS)]
+
+    scale_height = si_quantity('scale_height_si', ureg.meter)
+    atmospheric_depth = si_quantity('atmospheric_depth_si', ureg.meter)
+    surface_molecular_number_density = si_quantity('surface_molecular_number_density_si', ureg.meter**-3)
+    atmospheric_weight = si_quantity('atmospheric_weight_si', ureg.kilogram / ureg.mol)
 
     @property
     def to_orrery(self):
@@ -253,26 +468,26 @@ class PlanetPage(ConcordanceEntryMixin, PlanetaryBodyMixin, Page):
         return {
             'title': self.title,
             'name': self.slug.replace('-', '_'),
-            'mass': self.mass.to("kg").magnitude,
-            'radius': self.radius.to("km").magnitude,
+            'mass': self.mass_si,
+            'radius': self.radius_si / 1000,
             'color': '#ff9932',
-            'siderealDay': self.rotational_period.to("second").magnitude,
-            'tilt': self.obliquity.to("degree").magnitude,
+            'siderealDay': self.rotational_period_si,
+            'tilt': math.degrees(self.obliquity_si),
             'relativeTo': self.orbited_object.slug.replace('-', '_'),
             'orbit': {
                 'base': {
-                    'a': self.semi_major_axis.to("km").magnitude,
-                    'e': float(self.eccentricity),
-                    'i': self.inclination.to("degree").magnitude,
+                    'a': self.semi_major_axis_si / 1000,
+                    'e': self.eccentricity_si,
+                    'i': math.degrees(self.inclination_si),
                     'l': 0,
-                    'lp': self.longitude_of_periapsis.to("degree").magnitude,
-                    'o': self.longitude_of_the_ascending_node.to("degree").magnitude
+                    'lp': math.degrees(self.longitude_of_periapsis_si),
+                    'o': math.degrees(self.longitude_of_the_ascending_node_si)
                 },
                 'day': {
                     'a': 0,
                     'e': 0,
                     'i': 0,
-                    'l': 360/self.orbital_period.to("year").magnitude/Q_(1, ureg.year).to("day").magnitude,
+                    'l': 360 / (self.orbital_period_si / SECONDS_PER_DAY),
                     'lp': 0,
                     'o': 0
                 }
@@ -285,3 +500,82 @@ class PlanetPage(ConcordanceEntryMixin, PlanetaryBodyMixin, Page):
             FieldPanel('surface_pressure'),
             InlinePanel('atmospheric_components', label="Atmospheric composition"),
         ], 'Atmospheric properties') ]
+
+
+
+def sky_texture_url(params, star_angle, density_profile=None):
+    """
+    Render a sky simulation scene to a PNG in the default storage, unless
+    one has already been rendered for the same atmosphere, and return its
+    URL. density_profile is passed on to sky.render_sky.
+    """
+    profile_key = None
+    if density_profile is not None:
+        profile_key = [np.asarray(values).tolist() for values in density_profile]
+    key = hashlib.sha1(
+        json.dumps([params, star_angle, SKY_TEXTURE_SIZE, profile_key], sort_keys=True).encode('utf-8')).hexdigest()
+    name = 'sky_simulations/{0}.png'.format(key)
+    if not default_storage.exists(name):
+        coefficients = params['rayleighCoefficients']
+        star_colour = params['starColor']
+        pixels = sky.render_sky(
+            SKY_TEXTURE_SIZE, SKY_TEXTURE_SIZE, star_angle,
+            [coefficients['red'], coefficients['green'], coefficients['blue']],
+            params['scaleHeight'], params['atmosphereDepth'], params['planetRadius'],
+            params['starIntensity'], [star_colour['red'], star_colour['green'], star_colour['blue']],
+            density_profile=density_profile)
+        image = BytesIO()
+        PILImage.fromarray(pixels).save(image, 'PNG')
+        name = default_storage.save(name, ContentFile(image.getvalue()))
+    return default_storage.url(name)
+
+
+@receiver(page_published, sender=PlanetPage)
+def queue_sky_textures(sender, instance, **kwargs):
+    # Rendering takes a while, so it's done outside the request (once the
+    # new revision is committed)
+    transaction.on_commit(lambda: render_sky_textures.delay(instance.pk))
+
+
+def load_bodies_beneath(page, live=False):
+    """
+    Load every planet and moon beneath a page, in tree order, along with their
+    atmospheric components and gases in two queries. With live=True, only
+    the published bodies whose planets (if they're moons) are published too.
+
+    Each body's parent is wired up in memory, so orbited_object,
+    AtmosphericComponent.partial_pressure and the atmospheric properties
+    don't go back to the database.
+    """
+    bodies = PlanetPage.objects.descendant_of(page)
+    if live:
+        bodies = bodies.live()
+    bodies = list(
+        bodies.order_by('path').prefetch_related(
+            Prefetch(
+                'atmospheric_components',
+                queryset=AtmosphericComponent.objects.select_related('atmospheric_gas')
+            )
+        )
+    )
+
+    pages_by_path = {page.path: page}
+    pages_by_path.update((body.path, body) for body in bodies)
+    for specific_page in pages_by_path.values():
+        # These are already the specific pages
+        specific_page.__dict__['specific'] = specific_page
+    for body in bodies:
+        parent = pages_by_path.get(body.path[:-body.steplen])
+        if parent is not None:
+            # Where treebeard caches the result of get_parent()
+            body._cached_parent_obj = parent
+
+    if live:
+        # Leave out moons of unpublished planets (parents come first)
+        published = {page.path}
+        for body in bodies:
+            if body.path[:-body.steplen] in published:
+                published.add(body.path)
+        bodies = [body for body in bodies if body.path in published]
+
+    return bodies
@@ -0,0 +1,123 @@
+from quantity_field import ureg
+Q_ = ureg.Quantity
+
+_CACHE_ATTRIBUTE = '_derived_property_cache'
+
+
+def _resolve(instance, path):
+    """
+    Follow a dotted attribute path (e.g. 'orbited_object.mass') from instance.
+    """
+    value = instance
+    for attribute in path.split('.'):
+        if value is None:
+            return None
+        value = getattr(value, attribute)
+    return value
+
+
+def _unchanged(previous, current):
+    return all(a is b or a == b for a, b in zip(previous, current))
+
+
+class derived_property(object):
+    """
+    A read-only property that is computed once per instance and reused until
+    one of the attributes it depends on changes.
+
+    Dependencies are given as attribute paths and may be model fields, other
+    derived properties or attributes of related objects:
+
+        @derived_property('semi_major_axis', 'orbited_object.luminosity')
+        def solar_constant(self):
+            ...
+
+    Because derived properties return the same object until they are
+    recomputed, a change to a field invalidates everything built on top of it.
+    """
+
+    def __init__(self, *depends_on):
+        self.depends_on = depends_on
+
+    def __call__(self, func):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+        return self
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        dependencies = tuple(_resolve(instance, path) for path in self.depends_on)
+        cache = instance.__dict__.setdefault(_CACHE_ATTRIBUTE, {})
+        if self.name in cache:
+            previous, value = cache[self.name]
+            if _unchanged(previous, dependencies):
+                return value
+
+        value = self.func(instance)
+        cache[self.name] = (dependencies, value)
+        return value
+
+
+def si_field(field_name, units):
+    """
+    A derived property holding a quantity field's value as a plain float in
+    the given (SI) units, so the physics can run without pint.
+
+    By convention it is assigned to '<field_name>_si'.
+    """
+    def to_si(self):
+        return getattr(self, field_name).to(units).magnitude
+    to_si.__name__ = field_name + '_si'
+    return derived_property(field_name)(to_si)
+
+
+def si_quantity(si_name, units):
+    """
+    A derived property wrapping the float property si_name (e.g. 'radius_si')
+    back up as a quantity in the given units, for use in templates.
+    """
+    def to_quantity(self):
+        return Q_(getattr(self, si_name), units)
+    to_quantity.__name__ = si_name[:-len('_si')]
+    return derived_property(si_name)(to_quantity)
+
+
+def clear_derived_properties(instance):
+    """
+    Forget every derived property computed for this instance, e.g. after its
+    atmospheric components have been edited in place.
+    """
+    instance.__dict__.pop(_CACHE_ATTRIBUTE, None)
+
+
+def update_catalogue_fields(instance):
+    """
+    Copy derived properties into the columns listed in the instance's
+    catalogue_fields, converting quantities to plain magnitudes in the given
+    units so they can be filtered and sorted on in the database.
+
+    Values that can't be derived for this instance (such as the temperature
+    of a body with no star above it) are stored as null.
+    """
+    for field_name, (property_name, units) in instance.catalogue_fields.items():
+        try:
+            value = getattr(instance, property_name)
+            if units is not None:
+                value = value.to(units).magnitude
+        except (AttributeError, TypeError, ValueError, ZeroDivisionError):
+            value = None
+        setattr(instance, field_name, value)
+
+
+def store_catalogue_fields(instances):
+    """
+    Recalculate and save the catalogue fields of each instance without going
+    through a full save().
+    """
+    for instance in instances:
+        update_catalogue_fields(instance)
+        type(instance).objects.filter(pk=instance.pk).update(
+            **{field_name: getattr(instance, field_name) for field_name in instance.catalogue_fields})
@@ -1,17 +1,28 @@
+from django.db import models, transaction
+from django.dispatch import receiver
+from django.utils.functional import cached_property
+
 from wagtail.core.models import Page
 from wagtail.core.fields import StreamField
+from wagtail.core.signals import page_published
 from wagtail.admin.edit_handlers import FieldPanel
 
 from quantity_field import ureg
 from quantity_field.fields import MultiQuantityField
 Q_ = ureg.Quantity
 
-from .base import COMMON_BLOCKS
-from .planetary_bodies import PlanetPage
+from .base import (
+    COMMON_BLOCKS, ASTRONOMICAL_UNIT, SOLAR_MASS, SOLAR_RADIUS, SOLAR_LUMINOSITY, SOLAR_LIFETIME,
+    SOLAR_SURFACE_TEMPERATURE
+)
+from .planetary_bodies import load_bodies_beneath
 from .mixins import ConcordanceEntryMixin
+from .properties import derived_property, si_field, si_quantity, update_catalogue_fields, store_catalogue_fields
+from ..physics import ephemeris, stars
+from ..tasks import render_sky_textures
 from ..blocks import StarPhysicalCharacteristicsBlock, StarOrbitalCharacteristicsBlock, OrbitalMechanicsOrbiterBlock
 
-import math
+import numpy as np
 
 class StarPage(ConcordanceEntryMixin, Page):
     """
@@ -29,135 +40,102 @@ class StarPage(ConcordanceEntryMixin, Page):
     ])
     mass = MultiQuantityField(units=(ureg.solar_mass, ureg.kilogram))
 
-    @property
-    def radius(self):
-        return Q_('1 solar_radius / solar_mass**0.8') * self.mass ** 0.8
-
-    @property
-    def luminosity(self):
-        return Q_('1 solar_luminosity / solar_mass**3.5') * self.mass ** 3.5
-
-    @property
-    def stellar_lifetime(self):
-        return Q_('1 solar_lifetime / solar_mass**-2.5') * self.mass ** -2.5
-
-    @property
-    def surface_temperature(self):
-        return Q_('1 solar_surface_temperature * solar_radius**0.5 / solar_luminosity**0.25') * (self.luminosity/self.radius**2)**0.25
-
-    @property
+    # Derived values stored in SI units, so catalogues can filter and sort
+    # on them in the database. These are recalculated on every save.
+    catalogue_luminosity = models.FloatField(
+        null=True, blank=True, editable=False, db_index=True, help_text="Luminosity (W)")
+    catalogue_spectral_class = models.CharField(
+        max_length=16, null=True, blank=True, editable=False, db_index=True)
+
+    catalogue_fields = {
+        'catalogue_luminosity': ('luminosity_si', None),
+        'catalogue_spectral_class': ('spectral_class', None),
+    }
+
+    def save(self, *args, **kwargs):
+        # Saves that only touch a few columns (e.g. saving a draft revision)
+        # leave the live values alone.
+        full_save = kwargs.get('update_fields') is None
+        if full_save:
+            update_catalogue_fields(self)
+        super(StarPage, self).save(*args, **kwargs)
+        if full_save:
+            store_catalogue_fields(load_bodies_beneath(self))
+
+    mass_si = si_field('mass', ureg.kilogram)
+
+    @derived_property('mass_si')
+    def solar_masses(self):
+        return self.mass_si / SOLAR_MASS
+
+    @derived_property('solar_masses')
+    def radius_si(self):
+        return SOLAR_RADIUS * self.solar_masses**0.8
+
+    @derived_property('solar_masses')
+    def luminosity_si(self):
+        return SOLAR_LUMINOSITY * self.solar_masses**3.5
+
+    @derived_property('solar_masses')
+    def stellar_lifetime_si(self):
+        return SOLAR_LIFETIME * self.solar_masses**-2.5
+
+    @derived_property('luminosity_si', 'radius_si')
+    def surface_temperature_si(self):
+        return SOLAR_SURFACE_TEMPERATURE * (
+            (self.luminosity_si / SOLAR_LUMINOSITY) / (self.radius_si / SOLAR_RADIUS)**2)**0.25
+
+    @derived_property('solar_masses')
     def spectral_class(self):
-        def spectral_subclass(mass, class_max, class_min):
-            return str(round(10* (1 - (mass-class_min)/(class_max-class_min)), 1))
-        solar_masses = self.mass.to('solar_mass').magnitude
-        if solar_masses >= 16:
-            return 'O'
-        elif solar_masses >= 2.1:
-            return 'B' + spectral_subclass(solar_masses, 16, 2.1)
-        elif solar_masses >=1.4:
-            return 'A' + spectral_subclass(solar_masses, 2.1, 1.4)
-        elif solar_masses >= 1.04:
-            return 'F' + spectral_subclass(solar_masses, 1.4, 1.04)
-        elif solar_masses >= 0.8:
-            return 'G' + spectral_subclass(solar_masses, 1.04, 0.8)
-        elif solar_masses >= 0.45:
-            return 'K' + spectral_subclass(solar_masses, 0.8, 0.45)
-        elif solar_masses >= 0.08:
-            return 'M' + spectral_subclass(solar_masses, 0.45, 0.08)
-        else:
-            return 'L'
-
-    @property
-    def habitable_zone_inner(self):
-        return Q_('1 au / solar_luminosity**0.5') * (self.luminosity / 1.1)**0.5
-
-    @property
-    def habitable_zone_outer(self):
-        return Q_('1 au / solar_luminosity**0.5') * (self.luminosity / 0.53)**0.5
-
-    @property
-    def system_boundary_inner(self):
-        return Q_('0.1 au / solar_mass') * self.mass
-
-    @property
-    def system_boundary_outer(self):
-        return Q_('40 au / solar_mass') * self.mass
-
-    @property
-    def frost_line(self):
-        return Q_('4.85 au / solar_luminosity**0.5') * self.luminosity**0.5
-
-    @property
-    def schwarzchild_radius(self):
-        return Q_('1 solar_radius / solar_mass') * self.mass * 2.95
-
-    @property
-    def white_dwarf_radius(self):
-        return Q_('1 solar_radius / solar_mass**-0.333333') * self.mass**-0.333333
-
-    @property
+        return stars.spectral_classes(self.solar_masses)
+
+    @derived_property('luminosity_si')
+    def habitable_zone_inner_si(self):
+        return ASTRONOMICAL_UNIT * (self.luminosity_si / SOLAR_LUMINOSITY / 1.1)**0.5
+
+    @derived_property('luminosity_si')
+    def habitable_zone_outer_si(self):
+        return ASTRONOMICAL_UNIT * (self.luminosity_si / SOLAR_LUMINOSITY / 0.53)**0.5
+
+    @derived_property('solar_masses')
+    def system_boundary_inner_si(self):
+        return 0.1 * ASTRONOMICAL_UNIT * self.solar_masses
+
+    @derived_property('solar_masses')
+    def system_boundary_outer_si(self):
+        return 40 * ASTRONOMICAL_UNIT * self.solar_masses
+
+    @derived_property('luminosity_si')
+    def frost_line_si(self):
+        return 4.85 * ASTRONOMICAL_UNIT * (self.luminosity_si / SOLAR_LUMINOSITY)**0.5
+
+    @derived_property('solar_masses')
+    def schwarzchild_radius_si(self):
+        return SOLAR_RADIUS * self.solar_masses * 2.95
+
+    @derived_property('solar_masses')
+    def white_dwarf_radius_si(self):
+        return SOLAR_RADIUS * self.solar_masses**-0.333333
+
+    radius = si_quantity('radius_si', ureg.meter)
+    luminosity = si_quantity('luminosity_si', ureg.watt)
+    stellar_lifetime = si_quantity('stellar_lifetime_si', ureg.second)
+    surface_temperature = si_quantity('surface_temperature_si', ureg.kelvin)
+    habitable_zone_inner = si_quantity('habitable_zone_inner_si', ureg.meter)
+    habitable_zone_outer = si_quantity('habitable_zone_outer_si', ureg.meter)
+    system_boundary_inner = si_quantity('system_boundary_inner_si', ureg.meter)
+    system_boundary_outer = si_quantity('system_boundary_outer_si', ureg.meter)
+    frost_line = si_quantity('frost_line_si', ureg.meter)
+    schwarzchild_radius = si_quantity('schwarzchild_radius_si', ureg.meter)
+    white_dwarf_radius = si_quantity('white_dwarf_radius_si', ureg.meter)
+
+    @derived_property('surface_temperature_si')
     def colour(self):
         """
-        Converts from K to RGB, algorithm courtesy of
-        http://www.tannerhelland.com/4435/convert-temperature-rgb-algorithm-code/
-
-        Code from https://gist.github.com/petrklus/b1f427accdf7438606a6
+        The colour of the star as an (r, g, b) tuple, from its surface
+        temperature (see concordance.physics.stars).
         """
-        colour_temperature = self.surface_temperature.to("kelvin").magnitude
-
-        #range check
-        if colour_temperature < 1000:
-            colour_temperature = 1000
-        elif colour_temperature > 40000:
-            colour_temperature = 40000
-
-        tmp_internal = colour_temperature / 100.0
-
-        # red
-        if tmp_internal <= 66:
-            red = 255
-        else:
-            tmp_red = 329.698727446 * math.pow(tmp_internal - 60, -0.1332047592)
-            if tmp_red < 0:
-                red = 0
-            elif tmp_red > 255:
-                red = 255
-            else:
-                red = tmp_red
-
-        # green
-        if tmp_internal <=66:
-            tmp_green = 99.4708025861 * math.log(tmp_internal) - 161.1195681661
-            if tmp_green < 0:
-                green = 0
-            elif tmp_green > 255:
-                green = 255
-            else:
-                green = tmp_green
-        else:
-            tmp_green = 288.1221695283 * math.pow(tmp_internal - 60, -0.0755148492)
-            if tmp_green < 0:
-                green = 0
-            elif tmp_green > 255:
-                green = 255
-            else:
-                green = tmp_green
-
-        # blue
-        if tmp_internal >=66:
-            blue = 255
-        elif tmp_internal <= 19:
-            blue = 0
-        else:
-            tmp_blue = 138.5177312231 * math.log(tmp_internal - 10) - 305.0447927307
-            if tmp_blue < 0:
-                blue = 0
-            elif tmp_blue > 255:
-                blue = 255
-            else:
-                blue = tmp_blue
-
-        return red, green, blue
+        return tuple(stars.star_colours(self.surface_temperature_si).tolist())
 
     @property
     def to_orrery(self):
@@ -170,17 +148,55 @@ class StarPage(ConcordanceEntryMixin, Page):
         return {
             'title': self.title,
             'name': self.slug.replace('-', '_'),
-            'mass': self.mass.to(ureg.kg).magnitude,
-            'radius': self.radius.to(ureg.km).magnitude,
+            'mass': self.mass_si,
+            'radius': self.radius_si / 1000,
             'color': '#{0}{1}{2}'.format(format(int(r), '02x'),format(int(g), '02x'), format(int(b), '02x')),
             # 'map': '/static/img/sunmap.jpg',
             'k': 0.01720209895,
         }
 
+    @cached_property
+    def system_bodies(self):
+        """
+        Every published planet and moon beneath this star, in tree order,
+        with their parents wired up in memory (see load_bodies_beneath).
+        """
+        return load_bodies_beneath(self, live=True)
+
+    def system_ephemeris(self, times):
+        """
+        Propagate every planet and moon in this system to each of the given
+        times since the epoch in a single pass.
+
+        Returns the bodies, in tree order, with quantity arrays of their
+        positions and velocities relative to this star, each of shape
+        (bodies, times, 3).
+        """
+        seconds = times.to(ureg.second).magnitude
+        bodies = self.system_bodies
+        if not bodies:
+            empty = np.zeros((0, np.size(seconds), 3))
+            return bodies, Q_(empty, ureg.meter), Q_(empty, ureg.meter / ureg.second)
+
+        elements = [body.orbital_elements for body in bodies]
+        positions, velocities = ephemeris.propagate(
+            times=seconds, **{key: [e[key] for e in elements] for key in elements[0]})
+
+        # Moons are propagated relative to their planets; since a planet
+        # always comes before its moons in tree order, adding the planet's
+        # (already star-relative) state moves each moon into the star's frame.
+        body_indexes = {body.path: i for i, body in enumerate(bodies)}
+        for i, body in enumerate(bodies):
+            parent_index = body_indexes.get(body.path[:-body.steplen])
+            if parent_index is not None:
+                positions[i] += positions[parent_index]
+                velocities[i] += velocities[parent_index]
+
+        return bodies, Q_(positions, ureg.meter), Q_(velocities, ureg.meter / ureg.second)
+
     @property
     def to_orrery_scenario(self):
-        child_planets = self.get_descendants().type(PlanetPage).all()
-        scenario_objects = [self.to_orrery] + [ p.specific.to_orrery for p in child_planets ]
+        scenario_objects = [self.to_orrery] + [ p.to_orrery for p in self.system_bodies ]
         bodies = {}
         for p in scenario_objects:
             bodies[p['name']] = p
@@ -204,3 +220,19 @@ class StarPage(ConcordanceEntryMixin, Page):
     content_panels = ConcordanceEntryMixin.content_panels + [
         FieldPanel('mass'),
     ]
+
+
+def load_star_system(star_id):
+    """
+    Load a star and every planet and moon in its system in a fixed number of
+    queries, ready to render without touching the database again.
+    """
+    star = StarPage.objects.get(id=star_id)
+    star.system_bodies
+    return star
+
+
+@receiver(page_published, sender=StarPage)
+def queue_sky_textures(sender, instance, **kwargs):
+    # The star sets the temperature, and so the skies, of its planets
+    transaction.on_commit(lambda: render_sky_textures.delay(instance.pk))
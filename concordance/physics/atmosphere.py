@@ -0,0 +1,28 @@
+"""
+Vertical profiles of an isothermal atmosphere.
+
+All values are floats or arrays in SI units (Pa, m, kg/mol, K); heights may
+be an array of any shape and the profile is returned in the same shape.
+"""
+import numpy as np
+
+
+def vertical_profile(surface_pressure, scale_height, molar_weight, temperature,
+                     gas_constant, avogadro_constant, heights):
+    """
+    Calculate the pressure (Pa), density (kg m^-3) and molecular number
+    density (m^-3) of the atmosphere at each of the given heights.
+
+    P = P0 * Exp(-h/H)
+    rho = P * M / (R * T)
+    N = NA * rho / M
+    """
+    heights = np.asarray(heights, dtype=float)
+    pressure = surface_pressure * np.exp(-heights / scale_height)
+    density = pressure * molar_weight / (gas_constant * temperature)
+    return {
+        'height': heights,
+        'pressure': pressure,
+        'density': density,
+        'molecular_number_density': avogadro_constant * density / molar_weight,
+    }
@@ -0,0 +1,79 @@
+"""
+Vectorised Keplerian orbit propagation.
+
+Orbital elements are passed as floats or arrays in SI units (metres, radians,
+m^3 s^-2) with one entry per body; times are seconds since the epoch. Every
+body is propagated to every time in a single set of array operations.
+"""
+import numpy as np
+
+
+def solve_kepler(mean_anomaly, eccentricity, tolerance=1e-12, max_iterations=30):
+    """
+    Solve Kepler's equation, M = E - e sin(E), for the eccentric anomaly E
+    using Newton's method on whole arrays at once.
+
+    Only elliptical orbits (0 <= e < 1) are supported.
+    """
+    mean_anomaly, eccentricity = np.broadcast_arrays(
+        np.remainder(mean_anomaly, 2 * np.pi), np.asarray(eccentricity, dtype=float))
+
+    # Starting from pi converges for every eccentricity; M is closer for
+    # nearly circular orbits.
+    eccentric_anomaly = np.where(eccentricity < 0.8, mean_anomaly, np.pi)
+    for _ in range(max_iterations):
+        delta = (eccentric_anomaly - eccentricity * np.sin(eccentric_anomaly) - mean_anomaly) / (
+            1 - eccentricity * np.cos(eccentric_anomaly))
+        eccentric_anomaly = eccentric_anomaly - delta
+        if np.all(np.abs(delta) < tolerance):
+            break
+    return eccentric_anomaly
+
+
+def propagate(semi_major_axis, eccentricity, inclination,
+              longitude_of_the_ascending_node, argument_of_periapsis,
+              mean_anomaly_at_epoch, gravitational_parameter, times):
+    """
+    Calculate the positions and velocities of a set of bodies, relative to
+    the bodies they orbit, at each of the given times.
+
+    Returns a pair of arrays of shape (bodies, times, 3), in metres and
+    metres per second respectively.
+    """
+    a, e, i, node, periapsis, m0, mu = (
+        np.asarray(element, dtype=float).reshape(-1, 1) for element in (
+            semi_major_axis, eccentricity, inclination, longitude_of_the_ascending_node,
+            argument_of_periapsis, mean_anomaly_at_epoch, gravitational_parameter))
+    t = np.asarray(times, dtype=float).reshape(1, -1)
+
+    mean_motion = np.sqrt(mu / a**3)
+    eccentric_anomaly = solve_kepler(m0 + mean_motion * t, e)
+    cos_e = np.cos(eccentric_anomaly)
+    sin_e = np.sin(eccentric_anomaly)
+
+    # Position and velocity in the orbital plane, with x towards periapsis
+    semi_minor_axis = a * np.sqrt(1 - e**2)
+    x = a * (cos_e - e)
+    y = semi_minor_axis * sin_e
+    angular_rate = mean_motion / (1 - e * cos_e)
+    vx = -a * sin_e * angular_rate
+    vy = semi_minor_axis * cos_e * angular_rate
+
+    # Rotate the orbital plane into the reference frame
+    cos_node, sin_node = np.cos(node), np.sin(node)
+    cos_peri, sin_peri = np.cos(periapsis), np.sin(periapsis)
+    cos_i, sin_i = np.cos(i), np.sin(i)
+    p = np.stack([
+        cos_node * cos_peri - sin_node * sin_peri * cos_i,
+        sin_node * cos_peri + cos_node * sin_peri * cos_i,
+        sin_peri * sin_i,
+    ], axis=-1)
+    q = np.stack([
+        -cos_node * sin_peri - sin_node * cos_peri * cos_i,
+        -sin_node * sin_peri + cos_node * cos_peri * cos_i,
+        cos_peri * sin_i,
+    ], axis=-1)
+
+    positions = x[..., np.newaxis] * p + y[..., np.newaxis] * q
+    velocities = vx[..., np.newaxis] * p + vy[..., np.newaxis] * q
+    return positions, velocities
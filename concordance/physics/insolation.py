@@ -0,0 +1,36 @@
+"""
+Vectorised insolation calculations.
+
+Everything here works on plain floats and NumPy arrays in SI units (angles in
+radians, fluxes in W m^-2); the models strip units before calling in and wrap
+the results back up afterwards.
+"""
+import numpy as np
+
+
+def insolation_grid(solar_constant, obliquity, eccentricity,
+                    longitude_of_periapsis, latitudes, true_anomalies):
+    """
+    Calculate the daily mean insolation at the top of the atmosphere for
+    every combination of latitude and true anomaly.
+
+    This is the vectorised form of PlanetaryBodyMixin.surface_insolation, and
+    follows the same conventions: the vernal equinox is at a true anomaly of
+    0, and places where the sun never rises receive nothing.
+
+    Returns an array of shape (len(latitudes), len(true_anomalies)).
+    """
+    latitudes = np.asarray(latitudes, dtype=float).reshape(-1, 1)
+    true_anomalies = np.asarray(true_anomalies, dtype=float).reshape(1, -1)
+
+    declination = obliquity * np.sin(true_anomalies)
+    distance_ratio = 1 + eccentricity * np.cos(true_anomalies - longitude_of_periapsis)
+
+    cos_h0 = -np.tan(latitudes) * np.tan(obliquity * np.sin(np.pi - true_anomalies))
+    hour_angle_0 = np.where(cos_h0 > 1, np.pi, np.arccos(np.clip(cos_h0, -1, 1)))
+
+    insolation = solar_constant / np.pi * distance_ratio**2 * (
+        hour_angle_0 * np.sin(latitudes) * np.sin(declination) +
+        np.cos(latitudes) * np.cos(declination) * np.sin(hour_angle_0)
+    )
+    return np.where(cos_h0 < -1, 0.0, insolation)
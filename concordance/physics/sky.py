@@ -0,0 +1,132 @@
+"""
+Vectorised Rayleigh and Mie sky rendering.
+
+This is a NumPy port of pages/static/shaders/atmosphere.frag (itself based
+on https://github.com/wwwtyro/glsl-atmosphere/), so pre-rendered textures
+match what the WebGL simulator draws. Every pixel's view ray is marched at
+once; lengths are in metres.
+"""
+import numpy as np
+
+# Fixed parameters of the shader
+RAY_ORIGIN = np.array([0, 6372e3, 0])
+MIE_COEFFICIENT = 21e-6
+MIE_SCALE_HEIGHT = 1.2e3
+MIE_DIRECTION = 0.758
+
+
+def _ray_sphere(origins, directions, radius):
+    """
+    Intersect rays with a sphere centred on the origin, returning the near
+    and far distances along each ray. Rays that miss give (1e5, -1e5).
+    """
+    a = np.sum(directions * directions, axis=-1)
+    b = 2 * np.sum(directions * origins, axis=-1)
+    c = np.sum(origins * origins, axis=-1) - radius**2
+    d = b**2 - 4 * a * c
+    root = np.sqrt(np.maximum(d, 0))
+    near = np.where(d < 0, 1e5, (-b - root) / (2 * a))
+    far = np.where(d < 0, -1e5, (-b + root) / (2 * a))
+    return near, far
+
+
+def sun_position(star_angle):
+    """
+    The direction of the sun for a scene, as set by the simulator script.
+    """
+    return np.array([0, np.cos(star_angle) * 0.3 + 0.2, -1])
+
+
+def render_sky(width, height, star_angle, rayleigh_coefficients, scale_height,
+               atmosphere_depth, planet_radius, star_intensity=1, star_colour=(1, 1, 1),
+               primary_steps=16, secondary_steps=8, density_profile=None):
+    """
+    Render the sky as seen looking out through a width x height quad, with
+    the sun at star_angle.
+
+    rayleigh_coefficients are the (red, green, blue) scattering coefficients
+    in m^-1. The Rayleigh density falls off as exp(-h/scale_height) unless a
+    density_profile of (ascending heights, densities relative to the surface)
+    is given, which is interpolated log-linearly instead. Like the shader's
+    exponential, it's extrapolated beyond its ends, as view rays can dip
+    below the surface. Returns an array of 8-bit RGB values of shape
+    (height, width, 3).
+    """
+    rayleigh = np.asarray(rayleigh_coefficients, dtype=float)
+    if density_profile is None:
+        def rayleigh_density(heights):
+            return np.exp(-heights / scale_height)
+    else:
+        profile_heights = np.asarray(density_profile[0], dtype=float)
+        log_densities = np.log(density_profile[1])
+        lower, upper = (
+            (log_densities[j] - log_densities[i]) / (profile_heights[j] - profile_heights[i])
+            for i, j in ((0, 1), (-2, -1)))
+
+        def rayleigh_density(heights):
+            log_density = np.interp(heights, profile_heights, log_densities)
+            log_density += (
+                np.minimum(heights - profile_heights[0], 0) * lower
+                + np.maximum(heights - profile_heights[-1], 0) * upper)
+            return np.exp(log_density)
+    atmosphere_radius = planet_radius + atmosphere_depth
+
+    # View rays through the centre of each pixel, with +y at the top
+    x = (np.arange(width) + 0.5) / width * 2 - 1
+    y = 1 - (np.arange(height) + 0.5) / height * 2
+    grid_x, grid_y = np.meshgrid(x, y)
+    rays = np.stack([grid_x, grid_y, -np.ones_like(grid_x)], axis=-1).reshape(-1, 3)
+    rays /= np.linalg.norm(rays, axis=-1, keepdims=True)
+
+    sun = sun_position(star_angle)
+    sun = sun / np.linalg.norm(sun)
+    star_colour = np.asarray(star_colour, dtype=float)
+    emission = star_intensity * 60 * star_colour / np.linalg.norm(star_colour)
+
+    near, far = _ray_sphere(RAY_ORIGIN, rays, atmosphere_radius)
+    misses = near > far
+    far = np.minimum(far, _ray_sphere(RAY_ORIGIN, rays, planet_radius)[0])
+    primary_step = (far - near) / primary_steps
+
+    # Rayleigh and Mie phase functions
+    mu = rays @ sun
+    g = MIE_DIRECTION
+    rayleigh_phase = 3 / (16 * np.pi) * (1 + mu**2)
+    mie_phase = 3 / (8 * np.pi) * ((1 - g**2) * (mu**2 + 1)) / ((1 + g**2 - 2 * mu * g)**1.5 * (2 + g**2))
+
+    total_rayleigh = np.zeros((len(rays), 3))
+    total_mie = np.zeros((len(rays), 3))
+    primary_depth_rayleigh = np.zeros(len(rays))
+    primary_depth_mie = np.zeros(len(rays))
+    secondary_offsets = np.arange(secondary_steps) + 0.5
+
+    for i in range(primary_steps):
+        positions = RAY_ORIGIN + rays * (primary_step * (i + 0.5))[:, np.newaxis]
+        heights = np.linalg.norm(positions, axis=-1) - planet_radius
+        step_rayleigh = rayleigh_density(heights) * primary_step
+        step_mie = np.exp(-heights / MIE_SCALE_HEIGHT) * primary_step
+        primary_depth_rayleigh += step_rayleigh
+        primary_depth_mie += step_mie
+
+        # March every secondary ray towards the sun at once
+        secondary_step = _ray_sphere(positions, sun, atmosphere_radius)[1] / secondary_steps
+        secondary_distances = secondary_step[:, np.newaxis] * secondary_offsets
+        samples = positions[:, np.newaxis, :] + sun * secondary_distances[..., np.newaxis]
+        sample_heights = np.linalg.norm(samples, axis=-1) - planet_radius
+        secondary_depth_rayleigh = np.sum(rayleigh_density(sample_heights), axis=-1) * secondary_step
+        secondary_depth_mie = np.sum(np.exp(-sample_heights / MIE_SCALE_HEIGHT), axis=-1) * secondary_step
+
+        attenuation = np.exp(-(
+            MIE_COEFFICIENT * (primary_depth_mie + secondary_depth_mie)[:, np.newaxis] +
+            rayleigh * (primary_depth_rayleigh + secondary_depth_rayleigh)[:, np.newaxis]))
+        total_rayleigh += step_rayleigh[:, np.newaxis] * attenuation
+        total_mie += step_mie[:, np.newaxis] * attenuation
+
+    colour = emission * (
+        rayleigh_phase[:, np.newaxis] * rayleigh * total_rayleigh +
+        (mie_phase * MIE_COEFFICIENT)[:, np.newaxis] * total_mie)
+    colour[misses] = 0
+
+    # Apply exposure
+    colour = 1 - np.exp(-colour)
+    return np.round(np.clip(colour, 0, 1) * 255).astype(np.uint8).reshape(height, width, 3)
@@ -0,0 +1,84 @@
+"""
+Vectorised star colours and spectral classes.
+
+Both are lookups into tables built once at import, so a catalogue or an
+HR diagram can classify thousands of stars in a single call. Temperatures
+are in kelvin and masses in solar masses.
+"""
+import numpy as np
+
+# Colours are tabulated every 10K across the range the approximation covers.
+# Its kink at 1900K falls on a table entry; at 6600K it jumps, so extra
+# entries either side keep the step sharp.
+COLOUR_TEMPERATURES = np.union1d(np.arange(1000, 40001, 10, dtype=float), [6599.999, 6600.001])
+
+# The lower mass bound of each spectral class, and the class below, between
+# and above them
+SPECTRAL_CLASS_BOUNDARIES = np.array([0.08, 0.45, 0.8, 1.04, 1.4, 2.1, 16])
+SPECTRAL_CLASS_LETTERS = ['L', 'M', 'K', 'G', 'F', 'A', 'B', 'O']
+
+
+def blackbody_colour(temperatures):
+    """
+    Converts from K to RGB, algorithm courtesy of
+    http://www.tannerhelland.com/4435/convert-temperature-rgb-algorithm-code/
+
+    Evaluates the approximation directly; use star_colours() for the
+    tabulated version.
+    """
+    t = np.clip(np.asarray(temperatures, dtype=float), 1000, 40000) / 100.0
+
+    # Each branch is only kept where it applies, so ignore the warnings from
+    # evaluating it out of its range
+    with np.errstate(invalid='ignore', divide='ignore'):
+        red = np.where(t <= 66, 255, 329.698727446 * (t - 60)**-0.1332047592)
+        green = np.where(
+            t <= 66,
+            99.4708025861 * np.log(t) - 161.1195681661,
+            288.1221695283 * (t - 60)**-0.0755148492)
+        blue = np.where(
+            t >= 66, 255, np.where(t <= 19, 0, 138.5177312231 * np.log(t - 10) - 305.0447927307))
+    return np.clip(np.stack([red, green, blue], axis=-1), 0, 255)
+
+
+COLOUR_TABLE = blackbody_colour(COLOUR_TEMPERATURES)
+
+
+def star_colours(temperatures):
+    """
+    The RGB colour of stars with the given surface temperatures, interpolated
+    from COLOUR_TABLE.
+
+    Returns an array with a trailing axis of length 3 (red, green, blue).
+    """
+    temperatures = np.asarray(temperatures, dtype=float)
+    return np.stack([
+        np.interp(temperatures, COLOUR_TEMPERATURES, COLOUR_TABLE[:, channel]) for channel in range(3)
+    ], axis=-1)
+
+
+def spectral_classes(masses):
+    """
+    The spectral class (e.g. 'G5.0') of main sequence stars with the given
+    masses.
+
+    Within each class the subclass runs linearly from 0 at its upper mass
+    bound to 10 at its lower one. Returns a list of strings for an array of
+    masses, or a string for a single mass.
+    """
+    masses = np.asarray(masses, dtype=float)
+    flat = masses.ravel()
+    indexes = np.searchsorted(SPECTRAL_CLASS_BOUNDARIES, flat, side='right')
+
+    # Only the bounded classes (M to B) have subclasses
+    bounded = (indexes > 0) & (indexes < len(SPECTRAL_CLASS_BOUNDARIES))
+    lower = SPECTRAL_CLASS_BOUNDARIES[np.clip(indexes - 1, 0, None)]
+    upper = SPECTRAL_CLASS_BOUNDARIES[np.clip(indexes, None, len(SPECTRAL_CLASS_BOUNDARIES) - 1)]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        subclasses = 10 * (1 - (flat - lower) / (upper - lower))
+
+    classes = [
+        SPECTRAL_CLASS_LETTERS[index] + (str(round(subclass, 1)) if is_bounded else '')
+        for index, subclass, is_bounded in zip(indexes, subclasses.tolist(), bounded)
+    ]
+    return classes[0] if masses.ndim == 0 else classes
@@ -0,0 +1,35 @@
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def render_sky_textures(page_id):
+    """
+    Render the sky simulation scenes of a published planet or moon, or of
+    every one beneath a published star, and store their URLs.
+
+    Only bodies that show a sky simulation are rendered. A body whose sky
+    can't be rendered is logged and skipped, so it doesn't hold up the
+    rest of the system.
+    """
+    # Imported here, as the models queue this task
+    from wagtail.core.models import Page
+    from .models import PlanetPage, load_bodies_beneath
+
+    page = Page.objects.filter(pk=page_id).first()
+    if page is None:
+        return
+    page = page.specific
+
+    bodies = load_bodies_beneath(page)
+    if isinstance(page, PlanetPage):
+        bodies.insert(0, page)
+    for body in bodies:
+        try:
+            if body.has_sky_simulation:
+                body.store_sky_textures()
+        except Exception:
+            logger.exception("Couldn't render the sky textures of %s (page %s)", body.title, body.pk)
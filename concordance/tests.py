@@ -1,3 +1,291 @@
-from django.test import TestCase
+import math
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+import numpy as np
+
+from quantity_field import ureg
+Q_ = ureg.Quantity
+
+from .models import StarPage, PlanetPage, AtmosphericGas, AtmosphericComponent
+from .models.base import GRAVITATIONAL_CONSTANT, STEFAN_CONSTANT
+from .models.planetary_bodies import AVOGADRO_CONSTANT, GAS_CONSTANT
+from .models.properties import derived_property, clear_derived_properties
+from .physics import ephemeris, insolation, sky, stars
+
+
+class Star(object):
+    def __init__(self, mass):
+        self.mass = mass
+
+
+class Orbiter(object):
+    def __init__(self, star, distance):
+        self.orbited_object = star
+        self.distance = distance
+        self.calls = 0
+
+    @derived_property('distance', 'orbited_object.mass')
+    def pull(self):
+        self.calls += 1
+        return self.orbited_object.mass / self.distance ** 2
+
+
+class DerivedPropertyTests(SimpleTestCase):
+    def test_value_is_computed_once(self):
+        orbiter = Orbiter(Star(4.0), 2.0)
+        self.assertEqual(orbiter.pull, 1.0)
+        self.assertEqual(orbiter.pull, 1.0)
+        self.assertEqual(orbiter.calls, 1)
+
+    def test_changing_a_field_invalidates(self):
+        orbiter = Orbiter(Star(4.0), 2.0)
+        orbiter.pull
+        orbiter.distance = 1.0
+        self.assertEqual(orbiter.pull, 4.0)
+        self.assertEqual(orbiter.calls, 2)
+
+    def test_changing_the_parent_invalidates(self):
+        star = Star(4.0)
+        orbiter = Orbiter(star, 2.0)
+        orbiter.pull
+        star.mass = 8.0
+        self.assertEqual(orbiter.pull, 2.0)
+        self.assertEqual(orbiter.calls, 2)
+
+    def test_clear_derived_properties(self):
+        orbiter = Orbiter(Star(4.0), 2.0)
+        orbiter.pull
+        clear_derived_properties(orbiter)
+        orbiter.pull
+        self.assertEqual(orbiter.calls, 2)
+
+
+class InsolationGridTests(SimpleTestCase):
+    def test_grid_shape(self):
+        grid = insolation.insolation_grid(
+            1361, math.radians(23.44), 0.0167, math.radians(102.9),
+            np.radians(np.linspace(-90, 90, 180)), np.radians(np.linspace(0, 360, 360)))
+        self.assertEqual(grid.shape, (180, 360))
+
+    def test_equator_at_equinox(self):
+        # With a circular orbit the equator receives S/pi at the equinoxes
+        grid = insolation.insolation_grid(1361, math.radians(23.44), 0, 0, [0], [0, math.pi])
+        np.testing.assert_allclose(grid, [[1361 / math.pi, 1361 / math.pi]])
+
+
+class EphemerisTests(SimpleTestCase):
+    def test_solve_kepler(self):
+        mean_anomaly = np.linspace(0, 2 * math.pi, 100).reshape(1, -1)
+        eccentricity = np.array([[0], [0.5], [0.95]])
+        eccentric_anomaly = ephemeris.solve_kepler(mean_anomaly, eccentricity)
+        np.testing.assert_allclose(
+            eccentric_anomaly - eccentricity * np.sin(eccentric_anomaly),
+            np.remainder(mean_anomaly, 2 * math.pi) * np.ones((3, 1)), atol=1e-10)
+
+    def test_body_returns_after_one_period(self):
+        mu = 1.32712440018e20
+        a = 1.496e11
+        period = 2 * math.pi * math.sqrt(a**3 / mu)
+        positions, velocities = ephemeris.propagate(
+            [a], [0.0167], [0.1], [0.2], [1.8], [0], [mu], [0, period / 2, period])
+        self.assertEqual(positions.shape, (1, 3, 3))
+        np.testing.assert_allclose(positions[0, 0], positions[0, 2], atol=1)
+        np.testing.assert_allclose(velocities[0, 0], velocities[0, 2], atol=1e-6)
+
+
+class SkyTests(SimpleTestCase):
+    def test_render_sky(self):
+        pixels = sky.render_sky(16, 8, 0, [5.5e-6, 13.0e-6, 22.4e-6], 8e3, 100e3, 6371e3)
+        self.assertEqual(pixels.shape, (8, 16, 3))
+        self.assertEqual(pixels.dtype, np.uint8)
+        # A clear daytime sky is bluer than it is red
+        self.assertGreater(pixels[0, 8, 2], pixels[0, 8, 0])
+
+    def test_density_profile_matches_exponential(self):
+        heights = np.linspace(0, 100e3, 11)
+        args = (16, 8, 0, [5.5e-6, 13.0e-6, 22.4e-6], 8e3, 100e3, 6371e3)
+        np.testing.assert_allclose(
+            sky.render_sky(*args, density_profile=(heights, np.exp(-heights / 8e3))).astype(int),
+            sky.render_sky(*args).astype(int), atol=1)
+
+
+class StarTableTests(SimpleTestCase):
+    def test_colour_table_matches_approximation(self):
+        temperatures = np.linspace(500, 45000, 5000)
+        np.testing.assert_allclose(
+            stars.star_colours(temperatures), stars.blackbody_colour(temperatures), atol=0.5)
+
+    def test_spectral_classes(self):
+        self.assertEqual(stars.spectral_classes([0.05, 0.08, 1.0, 1.04, 20]), ['L', 'M10.0', 'G1.7', 'F10.0', 'O'])
+        self.assertEqual(stars.spectral_classes(1.0), 'G1.7')
+
+
+class SIParityTests(SimpleTestCase):
+    """
+    The models calculate in plain SI floats; check they agree with the
+    original unit-aware (pint) formulas.
+    """
+
+    def setUp(self):
+        self.star = StarPage(title='Sol', slug='sol', path='000100010001', depth=3, mass=Q_(1.1, ureg.solar_mass))
+        self.star.__dict__['specific'] = self.star
+        self.planet = PlanetPage(
+            title='Terra', slug='terra', path='0001000100010001', depth=4,
+            mass=Q_(1.2, ureg.earth_mass), radius=Q_(6800, ureg.km),
+            semi_major_axis=Q_(1.3, ureg.au), eccentricity=0.0167,
+            inclination=Q_(1.5, ureg.degree), longitude_of_the_ascending_node=Q_(-11.3, ureg.degree),
+            argument_of_periapsis=Q_(114.2, ureg.degree), rotational_period=Q_(26, ureg.hour),
+            obliquity=Q_(23.4, ureg.degree), surface_pressure=Q_(1.1, ureg.atm))
+        self.planet._cached_parent_obj = self.star
+        self.planet.atmospheric_components = [
+            AtmosphericComponent(percentage=78, atmospheric_gas=AtmosphericGas(
+                name='Nitrogen', molar_weight=Q_(0.0280134, ureg.kg / ureg.mol), refractive_index=1.000298)),
+            AtmosphericComponent(percentage=22, atmospheric_gas=AtmosphericGas(
+                name='Oxygen', molar_weight=Q_(0.0319988, ureg.kg / ureg.mol), refractive_index=1.000271)),
+        ]
+
+    def assertQuantityEqual(self, actual, expected):
+        self.assertAlmostEqual(actual.to(expected.units).magnitude / expected.magnitude, 1, places=9)
+
+    def test_star(self):
+        mass = self.star.mass
+        radius = Q_('1 solar_radius / solar_mass**0.8') * mass ** 0.8
+        luminosity = Q_('1 solar_luminosity / solar_mass**3.5') * mass ** 3.5
+        self.assertQuantityEqual(self.star.radius, radius)
+        self.assertQuantityEqual(self.star.luminosity, luminosity)
+        self.assertQuantityEqual(self.star.stellar_lifetime, Q_('1 solar_lifetime / solar_mass**-2.5') * mass ** -2.5)
+        self.assertQuantityEqual(
+            self.star.surface_temperature,
+            Q_('1 solar_surface_temperature * solar_radius**0.5 / solar_luminosity**0.25')
+            * (luminosity/radius**2)**0.25)
+        self.assertQuantityEqual(
+            self.star.habitable_zone_inner, Q_('1 au / solar_luminosity**0.5') * (luminosity / 1.1)**0.5)
+        self.assertQuantityEqual(
+            self.star.habitable_zone_outer, Q_('1 au / solar_luminosity**0.5') * (luminosity / 0.53)**0.5)
+        self.assertQuantityEqual(self.star.system_boundary_inner, Q_('0.1 au / solar_mass') * mass)
+        self.assertQuantityEqual(self.star.system_boundary_outer, Q_('40 au / solar_mass') * mass)
+        self.assertQuantityEqual(self.star.frost_line, Q_('4.85 au / solar_luminosity**0.5') * luminosity**0.5)
+        self.assertQuantityEqual(self.star.schwarzchild_radius, Q_('1 solar_radius / solar_mass') * mass * 2.95)
+        self.assertQuantityEqual(
+            self.star.white_dwarf_radius, Q_('1 solar_radius / solar_mass**-0.333333') * mass**-0.333333)
+        self.assertEqual(self.star.spectral_class, 'G' + str(round(10 * (1 - (1.1 - 0.8)/(1.04 - 0.8)), 1)))
+
+    def test_orbit(self):
+        planet = self.planet
+        a = planet.semi_major_axis
+        period = (((4 * math.pi**2) / (GRAVITATIONAL_CONSTANT * self.star.mass)) * a**3)**0.5
+        self.assertQuantityEqual(planet.periapsis, a * (1 - 0.0167))
+        self.assertQuantityEqual(planet.apoapsis, a * (1 + 0.0167))
+        self.assertQuantityEqual(planet.orbital_period, period)
+        self.assertQuantityEqual(
+            planet.longitude_of_periapsis, planet.longitude_of_the_ascending_node + planet.argument_of_periapsis)
+        self.assertQuantityEqual(planet.local_days_in_year, (period / planet.rotational_period).to_reduced_units())
+        self.assertQuantityEqual(planet.polar_circles, Q_('90 degree') - planet.obliquity)
+
+    def test_planetary_body(self):
+        planet = self.planet
+        mass, radius = planet.mass, planet.radius
+        luminosity = Q_('1 solar_luminosity / solar_mass**3.5') * self.star.mass ** 3.5
+        solar_constant = luminosity / (4 * math.pi * planet.semi_major_axis ** 2)
+        self.assertQuantityEqual(planet.surface_gravity, GRAVITATIONAL_CONSTANT * mass / radius**2)
+        self.assertQuantityEqual(planet.density, mass / ((4/3) * math.pi * radius**3))
+        self.assertQuantityEqual(planet.escape_velocity, (2 * GRAVITATIONAL_CONSTANT * mass / radius)**0.5)
+        self.assertQuantityEqual(planet.solar_constant, solar_constant)
+        self.assertQuantityEqual(
+            planet.mean_surface_temperature,
+            ((solar_constant * math.pi * radius**2)/(STEFAN_CONSTANT * 4 * math.pi * radius**2))**0.25)
+        self.assertTrue(planet.mass_is_terran)
+        self.assertFalse(planet.mass_is_jovian)
+
+    def test_atmosphere(self):
+        planet = self.planet
+        weight = 0.78 * Q_(0.0280134, ureg.kg / ureg.mol) + 0.22 * Q_(0.0319988, ureg.kg / ureg.mol)
+        temperature = planet.mean_surface_temperature
+        scale_height = (GAS_CONSTANT * temperature)/(weight * planet.surface_gravity)
+        height = Q_(5, ureg.km)
+        pressure = planet.surface_pressure * math.exp(-(height/scale_height).to_reduced_units())
+        density = (pressure * weight)/(GAS_CONSTANT * temperature)
+        surface_density = (planet.surface_pressure * weight)/(GAS_CONSTANT * temperature)
+        n = 0.78 * 1.000298 + 0.22 * 1.000271
+        self.assertQuantityEqual(planet.atmospheric_weight, weight)
+        self.assertQuantityEqual(planet.scale_height, scale_height)
+        self.assertQuantityEqual(planet.atmospheric_pressure(height), pressure)
+        self.assertQuantityEqual(planet.atmospheric_density(height), density)
+        self.assertQuantityEqual(planet.molecular_number_density(height), AVOGADRO_CONSTANT * density / weight)
+        self.assertQuantityEqual(
+            planet.atmospheric_depth,
+            -scale_height * math.log((Q_(6E-6, ureg.atm) / planet.surface_pressure).to_reduced_units()))
+        surface_number_density = AVOGADRO_CONSTANT * surface_density / weight
+        self.assertQuantityEqual(planet.surface_molecular_number_density, surface_number_density)
+        self.assertQuantityEqual(
+            planet.rayleigh_scattering_coefficients['blue'],
+            8 * math.pi**3 * (n**2 - 1)**2/3 * 1/surface_number_density * 1/Q_('440 nanometer')**4)
+
+    def test_moon_is_lit_by_planets_star(self):
+        self.planet.__dict__['specific'] = self.planet
+        moon = PlanetPage(title='Luna', slug='luna', path='00010001000100010001', depth=5)
+        moon._cached_parent_obj = self.planet
+        self.assertIs(moon.star_orbit, self.planet)
+        self.assertEqual(moon.solar_constant_si, self.planet.solar_constant_si)
+
+    def test_has_sky_simulation(self):
+        # Terra has an atmosphere, but no sky_simulation block
+        self.assertFalse(self.planet.has_sky_simulation)
+        airless = PlanetPage(title='Luna', surface_pressure=Q_(0, ureg.atm))
+        self.assertFalse(airless.has_sky_simulation)
+
+    def test_sky_simulation_scenes(self):
+        self.planet.sky_textures = '{"day": "/media/sky_simulations/day.png"}'
+        scenes = self.planet.sky_simulation_scenes
+        self.assertEqual([scene['name'] for scene in scenes], ['day', 'sunset', 'dusk'])
+        self.assertEqual(scenes[1]['params']['starAngle'], 2.0944)
+        self.assertEqual(scenes[1]['params']['scaleHeight'], self.planet.scale_height_si)
+        self.assertEqual(scenes[0]['texture_url'], '/media/sky_simulations/day.png')
+        # Not rendered yet
+        self.assertIsNone(scenes[1]['texture_url'])
+
+    def test_seasonal_insolation(self):
+        # The vectorised grid agrees with the scalar formula everywhere,
+        # including where the sun never rises
+        planet = self.planet
+        latitudes = {
+            'equator': Q_(0, ureg.degree),
+            'north_tropic': planet.tropics,
+            'north_polar_circle': planet.polar_circles,
+            'north_pole': Q_(90, ureg.degree),
+            'south_tropic': -planet.tropics,
+            'south_polar_circle': -planet.polar_circles,
+            'south_pole': Q_(-90, ureg.degree),
+        }
+        seasons = {
+            'vernal_equinox': Q_(0, ureg.degree),
+            'summer_solstice': Q_(90, ureg.degree),
+            'autumnal_equinox': Q_(180, ureg.degree),
+            'winter_solstice': Q_(270, ureg.degree),
+        }
+        for latitude_name, latitude in latitudes.items():
+            for season_name, true_anomaly in seasons.items():
+                with self.subTest(latitude=latitude_name, season=season_name):
+                    self.assertAlmostEqual(
+                        planet.seasonal_insolation[latitude_name][season_name].to('watt / meter**2').magnitude,
+                        planet.surface_insolation(latitude, true_anomaly).to('watt / meter**2').magnitude,
+                        places=6)
+
+    def test_atmospheric_profile_rows(self):
+        rows = self.planet.atmospheric_profile_rows
+        self.assertEqual(len(rows), 6)
+        self.assertQuantityEqual(rows[0]['pressure'], self.planet.surface_pressure)
+        self.assertQuantityEqual(rows[-1]['height'], self.planet.atmospheric_depth)
+
+    def test_atmospheric_profile(self):
+        planet = self.planet
+        profile = planet.atmospheric_profile(samples=11)
+        self.assertEqual(profile['pressure'].shape, (11,))
+        self.assertAlmostEqual(profile['height'][-1], planet.atmospheric_depth.to(ureg.meter).magnitude)
+        for i in (0, 5, 10):
+            height = Q_(profile['height'][i], ureg.meter)
+            self.assertAlmostEqual(profile['pressure'][i] / planet.atmospheric_pressure(height).magnitude, 1)
+            self.assertAlmostEqual(profile['density'][i] / planet.atmospheric_density(height).magnitude, 1)
+            self.assertAlmostEqual(
+                profile['molecular_number_density'][i] / planet.molecular_number_density(height).magnitude, 1)
@@ -0,0 +1,7 @@
+from django.conf.urls import url
+
+from . import views
+
+urlpatterns = [
+    url(r'^orrery/(?P<star_id>\d+)\.json$', views.orrery_scenario, name='concordance_orrery_scenario'),
+]
@@ -1,3 +1,21 @@
-from django.shortcuts import render
+from django.http import HttpResponse, Http404
+from django.utils.http import http_date
 
-# Create your views here.
+from .models import OrreryScenario, StarPage
+
+
+def orrery_scenario(request, star_id):
+    """
+    Serve the stored orrery scenario for a live star system.
+    """
+    orrery_scenario = OrreryScenario.objects.filter(star_id=star_id, star__live=True).first()
+    if orrery_scenario is None:
+        try:
+            star = StarPage.objects.live().get(id=star_id)
+        except StarPage.DoesNotExist:
+            raise Http404
+        orrery_scenario = OrreryScenario.build(star)
+
+    response = HttpResponse(orrery_scenario.scenario, content_type='application/json')
+    response['Last-Modified'] = http_date(orrery_scenario.updated_at.timestamp())
+    return response
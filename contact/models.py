@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from wagtail.core.fields import RichTextField
 
 from wagtail.admin.edit_handlers import (
@@ -10,13 +12,38 @@ from wagtail.core.models import Page
 from wagtail.contrib.forms.models import AbstractEmailForm, AbstractFormField
 from modelcluster.fields import ParentalKey
 from utils.models import ContactFields
+from utils.fragments import clear_fragments_on_commit
+from .tasks import send_form_submission_email
+
+
+def form_submission_content(form):
+    content = []
+    for field in form:
+        value = field.value()
+        if isinstance(value, list):
+            value = ', '.join(value)
+        content.append('{}: {}'.format(field.label, value))
+    return '\n'.join(content)
+
+
+class CeleryEmailFormMixin(object):
+    """
+    Sends the email for a form submission from a Celery task, queued once
+    the request's transaction (which saves the submission) has committed,
+    so the request doesn't wait on the mail server.
+    """
+
+    def send_mail(self, form):
+        addresses = [x.strip() for x in self.to_address.split(',')]
+        args = (self.subject, form_submission_content(form), addresses, self.from_address)
+        transaction.on_commit(lambda: send_form_submission_email.delay(*args))
 
 
 class FormField(AbstractFormField):
     page = ParentalKey('contact.FormPage', related_name='form_fields')
 
 
-class FormPage(AbstractEmailForm):
+class FormPage(CeleryEmailFormMixin, AbstractEmailForm):
     intro = RichTextField(blank=True)
     thank_you_text = RichTextField(blank=True)
     feed_image = models.ForeignKey(
@@ -51,7 +78,7 @@ class ContactFormField(AbstractFormField):
     page = ParentalKey('contact.ContactPage', related_name='form_fields')
 
 
-class ContactPage(AbstractEmailForm, ContactFields):
+class ContactPage(CeleryEmailFormMixin, AbstractEmailForm, ContactFields):
     intro = models.CharField(max_length=255, blank=True)
     thank_you_text = RichTextField(blank=True)
     feed_image = models.ForeignKey(
@@ -80,3 +107,11 @@ ContactPage.content_panels = [
 ContactPage.promote_panels = Page.promote_panels + [
     ImageChooserPanel('feed_image'),
 ]
+
+
+# Fragments showing contact details (get_contact_fields)
+
+@receiver(post_save, sender=ContactPage)
+@receiver(post_delete, sender=ContactPage)
+def clear_contact_fragments(sender, **kwargs):
+    clear_fragments_on_commit('contact')
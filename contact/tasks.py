@@ -0,0 +1,17 @@
+import smtplib
+
+from celery import shared_task
+
+from wagtail.admin.utils import send_mail
+
+
+# Mail server errors are retried with exponential backoff from a minute,
+# waiting up to about half a day in all, before the task gives up
+@shared_task(
+    autoretry_for=(smtplib.SMTPException, OSError),
+    retry_backoff=60,
+    retry_backoff_max=60 * 60 * 4,
+    max_retries=10,
+)
+def send_form_submission_email(subject, content, addresses, from_address):
+    send_mail(subject, content, addresses, from_address)
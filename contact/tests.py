@@ -1 +1,58 @@
-# Create your tests here.
+from unittest import mock
+
+from django import forms
+from django.core import mail
+from django.test import TestCase
+
+from wagtail.contrib.forms.models import FormSubmission
+from wagtail.core.models import Site
+
+from .models import FormField, FormPage, form_submission_content
+from .tasks import send_form_submission_email
+
+
+class ExampleForm(forms.Form):
+    name = forms.CharField(label="Your name")
+    topics = forms.MultipleChoiceField(label="Topics", choices=[('stars', 'Stars'), ('planets', 'Planets')])
+
+
+class FormSubmissionEmailTests(TestCase):
+    def test_content(self):
+        form = ExampleForm({'name': 'Slartibartfast', 'topics': ['stars', 'planets']})
+        self.assertEqual(form_submission_content(form), "Your name: Slartibartfast\nTopics: stars, planets")
+
+    def test_task_sends_email(self):
+        # Tasks run eagerly in the development settings used for tests
+        send_form_submission_email.delay(
+            "New enquiry", "Your name: Slartibartfast", ['fjords@example.com'], 'site@example.com')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, "New enquiry")
+        self.assertEqual(mail.outbox[0].to, ['fjords@example.com'])
+
+
+class FormPageSubmissionTests(TestCase):
+    def setUp(self):
+        root = Site.objects.get(is_default_site=True).root_page
+        self.page = root.add_child(instance=FormPage(
+            title="Enquiries", slug='enquiries', subject="New enquiry",
+            to_address='fjords@example.com, coasts@example.com', from_address='site@example.com',
+            form_fields=[FormField(label="Name", field_type='singleline', required=True)]))
+
+    def test_email_is_queued_after_commit(self):
+        # TestCase never commits, so the on_commit callbacks are collected
+        # and run by hand
+        with mock.patch('contact.models.transaction.on_commit') as on_commit, \
+                mock.patch('contact.models.send_form_submission_email.delay') as delay:
+            response = self.client.post(self.page.url, {'name': 'Slartibartfast'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(FormSubmission.objects.filter(page=self.page).count(), 1)
+
+            # Nothing is sent before the submission is committed
+            self.assertEqual(len(mail.outbox), 0)
+            delay.assert_not_called()
+
+            self.assertEqual(on_commit.call_count, 1)
+            on_commit.call_args[0][0]()
+
+        delay.assert_called_once_with(
+            "New enquiry", "Name: Slartibartfast", ['fjords@example.com', 'coasts@example.com'], 'site@example.com')
@@ -1,8 +1,11 @@
+from django.contrib.contenttypes.models import ContentType
 from django.db import models
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 from wagtail.core.fields import RichTextField
 from wagtail.core.models import Page
+from wagtail.core.signals import page_published
 from wagtail.admin.edit_handlers import FieldPanel, MultiFieldPanel
 from wagtail.documents.models import Document
 from wagtail.images.edit_handlers import ImageChooserPanel
@@ -11,7 +14,13 @@ from wagtail.search import index
 from modelcluster.fields import ParentalKey
 from modelcluster.tags import ClusterTaggableManager
 
-from taggit.models import TaggedItemBase
+from taggit.models import TaggedItem, TaggedItemBase
+
+from utils.fragments import cached_value, clear_fragments_on_commit
+from utils.pagination import clean_token, keyset_page, paginate
+
+# Newest first; id breaks ties so keyset pages are stable
+DOCUMENT_ORDERING = ('-created_at', '-id')
 
 
 class DocumentsIndexPage(Page):
@@ -93,28 +102,30 @@ class DocumentsPage(Page):
         # Find closest ancestor which is a Gallery index
         return self.get_ancestors().type(DocumentsIndexPage).last()
 
+    @property
+    def documents(self):
+        """
+        The documents with any of this page's tags. They're found by tag ID
+        in the taggit through table, so there are no joins to de-duplicate.
+        """
+        tagged_documents = TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Document),
+            tag_id__in=list(self.tags.values_list('id', flat=True)),
+        ).values('object_id')
+        return Document.objects.filter(id__in=tagged_documents)
+
     def get_context(self, request):
-        # Get tags and convert them into list so we can iterate over them
-        tags = self.tags.values_list('name', flat=True)
-
-        # Creating empty Queryset from Wagtail Document model
-        documents = Document.objects.none()
-
-        if tags:
-            len_tags = len(tags)
-            for i in range(0, len_tags):
-                doc = Document.objects.filter(tags__name=tags[i])
-                documents = documents | doc
-
-        # Pagination
-        page = request.GET.get('page')
-        paginator = Paginator(documents, 25)  # Show 25 documents per page
-        try:
-            documents = paginator.page(page)
-        except PageNotAnInteger:
-            documents = paginator.page(1)
-        except EmptyPage:
-            documents = paginator.page(paginator.num_pages)
+        # Pagination, 25 documents per page
+        if 'page' in request.GET:
+            # An old numbered link
+            documents = paginate(request, self.documents, DOCUMENT_ORDERING, 25)
+        else:
+            # Invalid tokens give the first page, rather than a new cache entry
+            after = clean_token(request.GET.get('after'), Document, DOCUMENT_ORDERING)
+            before = clean_token(request.GET.get('before'), Document, DOCUMENT_ORDERING)
+            documents = cached_value(
+                ['documents'], 'documents_page', [self.pk, self.last_published_at, after, before],
+                lambda: keyset_page(self.documents, DOCUMENT_ORDERING, 25, after=after, before=before))
 
         # Update template context
         context = super(DocumentsPage, self).get_context(request)
@@ -134,3 +145,14 @@ DocumentsPage.promote_panels = [
     MultiFieldPanel(Page.promote_panels, "SEO and metadata fields"),
     ImageChooserPanel('feed_image'),
 ]
+
+
+# Fragments showing documents (latest_documents), and the documents on documents pages
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+@receiver(post_save, sender=TaggedItem)
+@receiver(post_delete, sender=TaggedItem)
+@receiver(page_published, sender=DocumentsPage)
+def clear_document_fragments(sender, **kwargs):
+    clear_fragments_on_commit('documents')
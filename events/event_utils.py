@@ -1,80 +1,111 @@
 from datetime import datetime, time, timedelta
 import hashlib
 
+from django.utils import timezone
 
-def export_event(event, format='ical'):
-    # Only ical format supported at the moment
-    if format != 'ical':
-        return
+CALENDAR_HEADER = [
+    'BEGIN:VCALENDAR',
+    'VERSION:2.0',
+    'PRODID:-//Magrathea//wagtail//EN',
+]
+
+CALENDAR_FOOTER = [
+    'END:VCALENDAR',
+]
+
+
+def add_slashes(string):
+    # Escape iCalendar TEXT values (backslashes first)
+    return (
+        (string or '')
+        .replace('\\', '\\\\')
+        .replace(',', '\\,')
+        .replace(';', '\\;')
+        .replace('\n', '\\n')
+    )
 
-    # Begin event
-    # VEVENT format: http://www.kanzaki.com/docs/ical/vevent.html
-    ical_components = [
-        'BEGIN:VCALENDAR',
-        'VERSION:2.0',
-        'PRODID:-//Magrathea//wagtail//EN',
-    ]
 
+def event_components(event, url):
+    """
+    Yield the VEVENT lines for event, one VEVENT for each day it lasts.
+    url is the event's full URL, so it's only worked out once per event.
+    """
     # Work out number of days the event lasts
     if event.date_to is not None:
         days = (event.date_to - event.date_from).days + 1
     else:
         days = 1
 
+    # Get times
+    if event.time_from is not None:
+        start_time = event.time_from
+    else:
+        start_time = time.min
+    if event.time_to is not None:
+        end_time = event.time_to
+    else:
+        end_time = time.max
+
+    # When this version of the event was created
+    stamp = event.latest_revision_created_at or timezone.now()
+    if timezone.is_aware(stamp):
+        stamp = timezone.make_naive(stamp, timezone.utc)
+
     for day in range(days):
         # Get date
         date = event.date_from + timedelta(days=day)
 
-        # Get times
-        if event.time_from is not None:
-            start_time = event.time_from
-        else:
-            start_time = time.min
-        if event.time_to is not None:
-            end_time = event.time_to
-        else:
-            end_time = time.max
-
         # Combine dates and times
-        start_datetime = datetime.combine(
-            date,
-            start_time
-        )
+        start_datetime = datetime.combine(date, start_time)
         end_datetime = datetime.combine(date, end_time)
 
-        def add_slashes(string):
-            string.replace('"', '\\"')
-            string.replace('\\', '\\\\')
-            string.replace(',', '\\,')
-            string.replace(':', '\\:')
-            string.replace(';', '\\;')
-            string.replace('\n', '\\n')
-            return string
-
         # Make a uid
-        uid = hashlib.sha1(event.url + str(start_datetime)).hexdigest() \
+        uid = hashlib.sha1((url + str(start_datetime)).encode('utf-8')).hexdigest() \
             + '@magrathea'
 
         # Make event
-        ical_components.extend([
-            'BEGIN:VEVENT',
-            'UID:' + add_slashes(uid),
-            'URL:' + add_slashes(event.url),
-            'DTSTAMP:' + start_time.strftime('%Y%m%dT%H%M%S'),
-            'SUMMARY:' + add_slashes(event.title),
-            'DESCRIPTION:' + add_slashes(event.search_description),
-            'LOCATION:' + add_slashes(event.location),
-            'DTSTART;TZID=Europe/London:' + start_datetime.strftime(
-                '%Y%m%dT%H%M%S'),
-            'DTEND;TZID=Europe/London:' + end_datetime.strftime(
-                '%Y%m%dT%H%M%S'),
-            'END:VEVENT',
-        ])
-
-    # Finish event
-    ical_components.extend([
-        'END:VCALENDAR',
-    ])
-
-    # Join components
-    return '\r'.join(ical_components)
+        # VEVENT format: http://www.kanzaki.com/docs/ical/vevent.html
+        yield 'BEGIN:VEVENT'
+        yield 'UID:' + uid
+        yield 'URL:' + url
+        yield 'DTSTAMP:' + stamp.strftime('%Y%m%dT%H%M%SZ')
+        yield 'SUMMARY:' + add_slashes(event.title)
+        yield 'DESCRIPTION:' + add_slashes(event.search_description)
+        yield 'LOCATION:' + add_slashes(event.location)
+        yield 'DTSTART;TZID=Europe/London:' + start_datetime.strftime('%Y%m%dT%H%M%S')
+        yield 'DTEND;TZID=Europe/London:' + end_datetime.strftime('%Y%m%dT%H%M%S')
+        yield 'END:VEVENT'
+
+
+def stream_calendar(events_and_urls):
+    """
+    Yield a VCALENDAR, line by line, for an iterable of (event, full URL)
+    pairs.
+    """
+    for line in CALENDAR_HEADER:
+        yield line + '\r\n'
+    for event, url in events_and_urls:
+        for line in event_components(event, url):
+            yield line + '\r\n'
+    for line in CALENDAR_FOOTER:
+        yield line + '\r\n'
+
+
+def event_url(event, request=None):
+    """
+    The event's full URL. Site root paths are looked up once per request,
+    so this costs no queries when called for many events.
+    """
+    url_parts = event.get_url_parts(request)
+    if url_parts is None:
+        return ''
+    site_id, root_url, page_path = url_parts
+    return root_url + page_path
+
+
+def export_event(event, format='ical', request=None):
+    # Only ical format supported at the moment
+    if format != 'ical':
+        return
+
+    return ''.join(stream_calendar([(event, event_url(event, request))]))
@@ -0,0 +1,17 @@
+# Generated by Django 2.0.8 on 2018-09-14 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_auto_20180607_1804'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventpage',
+            index=models.Index(fields=['date_from', 'date_to'], name='events_date_range_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.0.8 on 2018-09-24 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_eventpage_date_range_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventpage',
+            index=models.Index(fields=['date_to'], name='events_date_to_idx'),
+        ),
+    ]
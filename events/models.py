@@ -1,9 +1,15 @@
 from django.db import models
-from datetime import date
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.http import HttpResponse
-from wagtail.core.models import Page, Orderable
+from django.db.models import Q
+from datetime import date, datetime, timedelta
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from wagtail.core.models import Page, PageManager, Orderable
+from wagtail.core.query import PageQuerySet
 from wagtail.core.fields import RichTextField
+from wagtail.core.signals import page_published, page_unpublished
 from wagtail.images.edit_handlers import ImageChooserPanel
 
 from wagtail.admin.edit_handlers import (
@@ -12,11 +18,14 @@ from wagtail.admin.edit_handlers import (
 from wagtail.search import index
 
 from modelcluster.tags import ClusterTaggableManager
-from taggit.models import TaggedItemBase, Tag
+from taggit.models import TaggedItemBase
 
 from modelcluster.fields import ParentalKey
 from utils.models import LinkFields, RelatedLink, CarouselItem
-from .event_utils import export_event
+from utils.facets import tag_facets
+from utils.fragments import cached_value, clear_fragments_on_commit, fragment_versions
+from utils.pagination import paginate
+from .event_utils import event_url, export_event, stream_calendar
 
 
 EVENT_AUDIENCE_CHOICES = (
@@ -46,11 +55,69 @@ class EventIndexPage(Page):
     @property
     def events(self):
         events = EventPage.objects.live().descendant_of(self)
-        events = events.filter(date_from__gte=date.today())
+        events = events.upcoming()
         events = events.order_by('date_from')
 
         return events
 
+    def serve(self, request):
+        if request.GET.get('format') == 'ical':
+            return self.serve_calendar(request)
+        if request.GET.get('format') == 'json':
+            return self.serve_month(request)
+        return super(EventIndexPage, self).serve(request)
+
+    def serve_month(self, request):
+        """
+        The events on during a month (?month=YYYY-MM, or this month) as
+        JSON, for calendar views. Months are cached until midnight or an
+        event is published, unpublished or deleted.
+        """
+        try:
+            start = datetime.strptime(request.GET.get('month') or date.today().strftime('%Y-%m'), '%Y-%m').date()
+        except ValueError:
+            return HttpResponseBadRequest('Unrecognised month: ' + request.GET['month'], content_type='text/plain')
+        end = (start + timedelta(days=31)).replace(day=1)
+
+        def get_events():
+            events = EventPage.objects.live().descendant_of(self).overlapping(start, end)
+            return [{
+                'title': event.title,
+                'url': event_url(event, request),
+                'date_from': event.date_from,
+                'date_to': event.date_to,
+                'time_from': event.time_from,
+                'time_to': event.time_to,
+                'location': event.location,
+            } for event in events.order_by('date_from', 'time_from', 'id')]
+
+        events = cached_value(
+            ['events'], 'event_calendar_month', [request.site.pk, self.pk, start, date.today()], get_events)
+        return JsonResponse({'month': start.strftime('%Y-%m'), 'events': events})
+
+    def serve_calendar(self, request):
+        """
+        Stream an iCalendar feed of every upcoming event. Calendar clients
+        that send back the ETag of the feed they have get a 304, without a
+        query, unless an event has been published, unpublished or deleted
+        (or a day has passed) since.
+
+        There's no Last-Modified: no event's timestamps say when one was
+        unpublished or dropped off the feed at midnight.
+        """
+        events = self.events
+        etag = quote_etag('{0}-{1}'.format(fragment_versions(['events'])[0], date.today().isoformat()))
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = StreamingHttpResponse(
+                stream_calendar((event, event_url(event, request)) for event in events.iterator()),
+                content_type='text/calendar',
+            )
+            response['Content-Disposition'] = 'attachment; filename=' + self.slug + '.ics'
+        response['ETag'] = etag
+        return response
+
     def get_context(self, request):
             # Get events
             events = self.events
@@ -59,23 +126,17 @@ class EventIndexPage(Page):
             if tag:
                 events = events.filter(tags__name=tag)
 
-            # Pagination
-            page = request.GET.get('page')
-            paginator = Paginator(events, 9)  # Show 10 events per page
-            try:
-                events = paginator.page(page)
-            except PageNotAnInteger:
-                events = paginator.page(1)
-            except EmptyPage:
-                events = paginator.page(paginator.num_pages)
+            # Pagination, 9 events per page
+            count = events.count
+            events = paginate(
+                request, events, ('date_from', 'id'), 9,
+                count=lambda: cached_value(
+                    ['events'], 'event_index_count', [self.pk, tag, date.today()], count))
 
             # Update template context
             context = super(EventIndexPage, self).get_context(request)
             context['events'] = events
-            context['tags'] = Tag.objects.filter(
-                events_eventpagetag_items__isnull=False,
-                events_eventpagetag_items__content_object__live=True
-            ).distinct().order_by('name')
+            context['tags'] = tag_facets(EventPageTag, self.events, ['events'], [self.pk, date.today()])
             return context
 
 EventIndexPage.content_panels = [
@@ -126,6 +187,31 @@ class EventPageTag(TaggedItemBase):
                                  related_name='tagged_items')
 
 
+class EventPageQuerySet(PageQuerySet):
+    def overlapping(self, start, end):
+        """
+        Events on at some point in [start, end): those starting before end
+        that finish (on date_to, or date_from for one day events) on or
+        after start.
+        """
+        return self.filter(date_from__lt=end).filter(
+            Q(date_to__gte=start) | Q(date_to__isnull=True, date_from__gte=start))
+
+    def upcoming(self):
+        """
+        Events that haven't finished, including those already under way.
+
+        Each side of the OR has an index (date_from leads the date range
+        index, and date_to has its own), so the database can combine the
+        two index scans rather than scanning every event.
+        """
+        today = date.today()
+        return self.filter(Q(date_from__gte=today) | Q(date_to__gte=today))
+
+
+EventPageManager = PageManager.from_queryset(EventPageQuerySet)
+
+
 class EventPage(Page):
     date_from = models.DateField("Start date")
     date_to = models.DateField(
@@ -161,6 +247,14 @@ class EventPage(Page):
 
     parent_page_types = ['events.EventIndexPage']
 
+    objects = EventPageManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date_from', 'date_to'], name='events_date_range_idx'),
+            models.Index(fields=['date_to'], name='events_date_to_idx'),
+        ]
+
     @property
     def event_index(self):
         return self.get_ancestors().type(EventIndexPage).last()
@@ -170,7 +264,7 @@ class EventPage(Page):
             if request.GET['format'] == 'ical':
                 # Export to ical format
                 response = HttpResponse(
-                    export_event(self, 'ical'),
+                    export_event(self, 'ical', request),
                     content_type='text/calendar',
                 )
                 content_dispo = 'attachment; filename=' + self.slug + '.ics'
@@ -204,3 +298,12 @@ EventPage.content_panels = [
 EventPage.promote_panels = Page.promote_panels + [
     ImageChooserPanel('feed_image'),
 ]
+
+
+# Fragments showing events (upcoming_events)
+
+@receiver(page_published, sender=EventPage)
+@receiver(page_unpublished, sender=EventPage)
+@receiver(post_delete, sender=EventPage)
+def clear_event_fragments(sender, **kwargs):
+    clear_fragments_on_commit('events')
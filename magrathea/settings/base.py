@@ -77,6 +77,7 @@ INSTALLED_APPS = (
     'wagtail.contrib.settings',
     'wagtail.contrib.forms',
     'wagtail.contrib.redirects',
+    'wagtail.contrib.frontend_cache',
     'wagtail.embeds',
     'wagtail.sites',
     'wagtail.users',
@@ -92,6 +93,8 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE = (
+    # Stores pages with the headers all the other middleware adds
+    'utils.page_cache.UpdatePageCacheMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -102,6 +105,7 @@ MIDDLEWARE = (
 
     'wagtail.core.middleware.SiteMiddleware',
     'wagtail.contrib.redirects.middleware.RedirectMiddleware',
+    'utils.page_cache.FetchFromPageCacheMiddleware',
 )
 
 
@@ -222,6 +226,19 @@ WAGTAILSEARCH_BACKENDS = {
     },
 }
 
+# Publishing a page purges it from the full-page cache (see utils.page_cache).
+# Add a CDN backend alongside the local one if the site is behind one.
+WAGTAILFRONTENDCACHE = {
+    'local': {
+        'BACKEND': 'utils.page_cache.LocalPageCacheBackend',
+    },
+}
+
+# Anonymous page responses are cached for this long (in seconds) unless
+# purged first. Only these query parameters vary the cached page.
+PAGE_CACHE_TIMEOUT = 60 * 10
+PAGE_CACHE_QUERY_PARAMETERS = ('page', 'after', 'before', 'tag', 'format', 'month', 'match')
+
 # Celery settings
 # When you have multiple sites using the same Redis server,
 # specify a different Redis DB. e.g. redis://localhost/5
@@ -34,6 +34,7 @@ CACHES = {
 # Helpful for local development and running tests
 CELERY_EAGER_PROPAGATES_EXCEPTIONS = True
 CELERY_ALWAYS_EAGER = True
+BROKER_URL = 'memory://'
 
 
 try:
@@ -22,7 +22,6 @@ ALLOWED_HOSTS = [env("DJANGO_ALLOWED_HOST_NAME"), ]
 DATABASES['default'] = env.db('PROD_DATABASE_URL')
 
 INSTALLED_APPS += (
-    "wagtail.contrib.frontend_cache",
     'gunicorn',
 )
 
@@ -10,6 +10,8 @@ from wagtail.core import urls as wagtail_urls
 from wagtail.images.views.serve import ServeView
 from wagtail.contrib.sitemaps.views import sitemap
 
+from concordance import urls as concordance_urls
+
 from wagtail_feeds.feeds import (
     BasicFeed, BasicJsonFeed, ExtendedFeed, ExtendedJsonFeed
 )
@@ -23,6 +25,7 @@ urlpatterns = [
     url(r'^admin/', include(wagtailadmin_urls)),
     url(r'^search/', include(wagtailsearch_urls)),
     url(r'^documents/', include(wagtaildocs_urls)),
+    url(r'^concordance/', include(concordance_urls)),
 
     url('^sitemap\.xml$', sitemap),
     url(r'^blog/feed/basic$', BasicFeed(), name='basic_feed'),
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 from wagtail.core import blocks
 from wagtail.core.models import Page, Orderable
@@ -14,6 +16,7 @@ from wagtail.admin.edit_handlers import (
     StreamFieldPanel)
 from wagtail.search import index
 from utils.models import LinkFields, RelatedLink, CarouselItem
+from utils.fragments import clear_fragments_on_commit
 from wagtail.contrib.settings.models import BaseSetting, register_setting
 
 
@@ -199,6 +202,9 @@ class StandardPage(Page):
         index.SearchField('body'),
     ]
 
+    # Renders the body, when published, for the body_html tag
+    body_template = 'pages/includes/body.html'
+
     @property
     def template(self):
         return self.template_string
@@ -373,3 +379,17 @@ FaqsPage.content_panels = [
     FieldPanel('title', classname="full title"),
     StreamFieldPanel('body'),
 ]
+
+
+# Fragments showing snippets (testimonials, testimonials_list, adverts)
+
+@receiver(post_save, sender=Testimonial)
+@receiver(post_delete, sender=Testimonial)
+def clear_testimonial_fragments(sender, **kwargs):
+    clear_fragments_on_commit('testimonials')
+
+
+@receiver(post_save, sender=Advert)
+@receiver(post_delete, sender=Advert)
+def clear_advert_fragments(sender, **kwargs):
+    clear_fragments_on_commit('adverts')
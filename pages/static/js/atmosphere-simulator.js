@@ -15,9 +15,13 @@ function createAtmosphere(elm, params) {
   canvas.width = params.width;
   canvas.height = params.height;
   // var aspectRatio = width/height;
-  docElement.appendChild(canvas);
 
+  // Without WebGL, leave the pre-rendered sky showing
   var gl = canvas.getContext('webgl');
+  if (!gl) {
+    return;
+  }
+  docElement.appendChild(canvas);
   gl.clearColor(0,0,0,0);
 
   var quad = Geometry(gl).attr('aPosition', [
@@ -48,7 +52,7 @@ function createAtmosphere(elm, params) {
 };
 
 var simulations = document.getElementsByClassName('atmosphere-simulation');
-for(var s in simulations) {
+for(var s = 0; s < simulations.length; s++) {
   var simulationParams = JSON.parse(simulations[s].textContent);
   createAtmosphere(simulations[s].parentElement, simulationParams);
 }
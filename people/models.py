@@ -1,8 +1,10 @@
 from django.db import models
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 
 from wagtail.core.models import Page, Orderable
 from wagtail.core.fields import RichTextField
+from wagtail.core.signals import page_published, page_unpublished
 from wagtail.images.edit_handlers import ImageChooserPanel
 from wagtail.images.models import Image
 
@@ -15,8 +17,11 @@ from wagtail.snippets.edit_handlers import SnippetChooserPanel
 
 from modelcluster.fields import ParentalKey
 from modelcluster.tags import ClusterTaggableManager
-from taggit.models import Tag, TaggedItemBase
+from taggit.models import TaggedItemBase
+from utils.facets import tag_facets
+from utils.fragments import cached_value, clear_fragments_on_commit
 from utils.models import ContactFields, RelatedLink
+from utils.pagination import paginate
 
 
 # Person page
@@ -46,8 +51,7 @@ class PersonIndexPage(Page):
 
     @property
     def tag_list(self):
-        tag_ids = PersonPageTag.objects.all().values_list('tag_id', flat=True)
-        return Tag.objects.filter(pk__in=tag_ids)
+        return tag_facets(PersonPageTag, self.persons, ['people'], [self.pk])
 
     def get_context(self, request):
         # Get persons
@@ -57,15 +61,11 @@ class PersonIndexPage(Page):
         if tag:
             persons = persons.filter(tags__name=tag)
 
-        # Pagination
-        page = request.GET.get('page')
-        paginator = Paginator(persons, 10)  # Show 10 persons per page
-        try:
-            persons = paginator.page(page)
-        except PageNotAnInteger:
-            persons = paginator.page(1)
-        except EmptyPage:
-            persons = paginator.page(paginator.num_pages)
+        # Pagination, 10 persons per page in tree order
+        count = persons.count
+        persons = paginate(
+            request, persons, ('path',), 10,
+            count=lambda: cached_value(['people'], 'person_index_count', [self.pk, tag], count))
 
         # Update template context
         context = super(PersonIndexPage, self).get_context(request)
@@ -148,3 +148,10 @@ PersonPage.promote_panels = [
     MultiFieldPanel(Page.promote_panels, "Common page configuration"),
     ImageChooserPanel('feed_image'),
 ]
+
+
+@receiver(page_published, sender=PersonPage)
+@receiver(page_unpublished, sender=PersonPage)
+@receiver(post_delete, sender=PersonPage)
+def clear_people_fragments(sender, **kwargs):
+    clear_fragments_on_commit('people')
@@ -1,17 +1,48 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
 from wagtail.core.fields import RichTextField
 from wagtail.core.models import Page
+from wagtail.core.signals import page_published
 from wagtail.admin.edit_handlers import FieldPanel, MultiFieldPanel
-from wagtail.images.models import Image
+from wagtail.images.models import Filter, Image
 from wagtail.images.edit_handlers import ImageChooserPanel
 from wagtail.search import index
 
 from modelcluster.fields import ParentalKey
 from modelcluster.tags import ClusterTaggableManager
 
-from taggit.models import TaggedItemBase
+from taggit.models import TaggedItem, TaggedItemBase
+from utils.fragments import cached_value, clear_fragments_on_commit
+
+# The renditions shown for each image on a gallery page, by name
+GALLERY_RENDITIONS = {
+    'thumbnail': 'fill-400x300',
+    'full': 'original',
+}
+
+
+def prefetch_renditions(images, renditions):
+    """
+    Set each image's renditions to a dict of its renditions for the filter
+    specs in renditions (a dict keyed by name), loading the existing ones
+    in a single query and creating any that are missing.
+    """
+    filters = {name: Filter(spec=spec) for name, spec in renditions.items()}
+    existing = {
+        (rendition.image_id, rendition.filter_spec, rendition.focal_point_key): rendition
+        for rendition in Image.get_rendition_model().objects.filter(
+            image__in=images, filter_spec__in=renditions.values())
+    }
+    for image in images:
+        image.renditions_by_name = {}
+        for name, image_filter in filters.items():
+            rendition = existing.get((image.pk, image_filter.spec, image_filter.get_cache_key(image)))
+            if rendition is None:
+                rendition = image.get_rendition(image_filter)
+            image.renditions_by_name[name] = rendition
 
 
 class GalleryIndexPage(Page):
@@ -94,21 +125,31 @@ class GalleryPage(Page):
         # Find closest ancestor which is a Gallery index
         return self.get_ancestors().type(GalleryIndexPage).last()
 
-    def get_context(self, request):
-        # Get tags and convert them into list so we can iterate over them
-        tags = self.tags.values_list('name', flat=True)
-
-        # Creating empty Queryset from Wagtail image model
-        images = Image.objects.none()
-
-        if tags:
-            for i in range(0, len(tags)):
-                img = Image.objects.filter(tags__name=tags[i])
-                images = images | img
+    @property
+    def image_ids(self):
+        """
+        The IDs of the images with any of this gallery's tags, newest first.
+        They're cached until a gallery is published or an image or its tags
+        change.
+        """
+        def get_image_ids():
+            tags = list(self.tags.values_list('name', flat=True))
+            if not tags:
+                return []
+            return list(
+                Image.objects.filter(tags__name__in=tags)
+                .order_by('-created_at', '-id')
+                .values_list('id', flat=True)
+                .distinct()
+            )
+
+        return cached_value(
+            ['gallery_images'], 'gallery_image_ids', [self.pk, self.last_published_at], get_image_ids)
 
-        # Pagination
+    def get_context(self, request):
+        # Pagination over the image IDs, so there's nothing to count
         page = request.GET.get('page')
-        paginator = Paginator(images, 20)  # Show 20 images per page
+        paginator = Paginator(self.image_ids, 20)  # Show 20 images per page
         try:
             images = paginator.page(page)
         except PageNotAnInteger:
@@ -116,6 +157,11 @@ class GalleryPage(Page):
         except EmptyPage:
             images = paginator.page(paginator.num_pages)
 
+        # Load this page's images, and their renditions, in page order
+        images_by_id = Image.objects.in_bulk(images.object_list)
+        images.object_list = [images_by_id[pk] for pk in images.object_list if pk in images_by_id]
+        prefetch_renditions(images.object_list, GALLERY_RENDITIONS)
+
         # Update template context
         context = super(GalleryPage, self).get_context(request)
         context['images'] = images
@@ -134,3 +180,14 @@ GalleryPage.promote_panels = [
     MultiFieldPanel(Page.promote_panels, "SEO and metadata fields"),
     ImageChooserPanel('feed_image'),
 ]
+
+
+# Gallery image IDs (GalleryPage.image_ids)
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+@receiver(post_save, sender=TaggedItem)
+@receiver(post_delete, sender=TaggedItem)
+@receiver(page_published, sender=GalleryPage)
+def clear_gallery_images(sender, **kwargs):
+    clear_fragments_on_commit('gallery_images')
@@ -1,8 +1,10 @@
 from django.db import models
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 
 from wagtail.core.models import Page, Orderable
 from wagtail.core.fields import RichTextField
+from wagtail.core.signals import page_published, page_unpublished
 from wagtail.images.edit_handlers import ImageChooserPanel
 from wagtail.images.models import Image
 
@@ -12,8 +14,11 @@ from wagtail.admin.edit_handlers import (
 )
 from modelcluster.fields import ParentalKey
 from modelcluster.tags import ClusterTaggableManager
-from taggit.models import Tag, TaggedItemBase
+from taggit.models import TaggedItemBase
+from utils.facets import faceted_pages, selected_tags, tag_facets, tag_set_key
+from utils.fragments import cached_value, clear_fragments_on_commit
 from utils.models import RelatedLink
+from utils.pagination import paginate
 
 
 # Product page
@@ -45,30 +50,26 @@ class ProductIndexPage(Page):
 
     @property
     def tag_list(self):
-        tag_ids = ProductPageTag.objects.all().values_list('tag_id', flat=True)
-        return Tag.objects.filter(pk__in=tag_ids)
+        return tag_facets(ProductPageTag, self.products, ['products'], [self.pk])
 
     def get_context(self, request):
         # Get products
         products = self.products
-        # Filter by tag
-        tag = request.GET.get('tag')
-        if tag:
-            products = products.filter(tags__name=tag)
-
-        # Pagination
-        page = request.GET.get('page')
-        paginator = Paginator(products, 12)  # Show 10 products per page
-        try:
-            products = paginator.page(page)
-        except PageNotAnInteger:
-            products = paginator.page(1)
-        except EmptyPage:
-            products = paginator.page(paginator.num_pages)
+        # Filter by tags
+        products, facets = faceted_pages(request, ProductPageTag, products, ['products'], [self.pk])
+
+        # Pagination, 12 products per page in tree order
+        tags, match = selected_tags(request)
+        count = products.count
+        products = paginate(
+            request, products, ('path',), 12,
+            count=lambda: cached_value(
+                ['products'], 'product_index_count', [self.pk, match, tag_set_key(tags)], count))
 
         # Update template context
         context = super(ProductIndexPage, self).get_context(request)
         context['products'] = products
+        context.update(facets)
         return context
 
 ProductIndexPage.content_panels = [
@@ -136,3 +137,10 @@ ProductPage.promote_panels = [
     MultiFieldPanel(Page.promote_panels, "Common page configuration"),
     ImageChooserPanel('feed_image'),
 ]
+
+
+@receiver(page_published, sender=ProductPage)
+@receiver(page_unpublished, sender=ProductPage)
+@receiver(post_delete, sender=ProductPage)
+def clear_products_fragments(sender, **kwargs):
+    clear_fragments_on_commit('products')
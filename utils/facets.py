@@ -0,0 +1,132 @@
+"""
+Tag facets (the tags on a set of pages, with how many pages have each) for
+index pages' tag clouds and filters.
+
+Facets are counted in one grouped query over the tags' through model and
+cached in the fragment groups (see utils.fragments) of the pages counted,
+so they're recounted only after one of those pages is published,
+unpublished or deleted. faceted_pages also filters pages by the tags
+chosen in the request, all of them or any.
+"""
+import hashlib
+from collections import namedtuple
+
+from django.db.models import Count
+from django.utils.http import urlencode
+
+from .fragments import cached_value
+
+
+class TagFacet(namedtuple('TagFacet', ['name', 'slug', 'count'])):
+    __slots__ = ()
+
+    def __str__(self):
+        return self.name
+
+
+def count_tags(through_model, pages):
+    """
+    The tags on pages (a queryset of the model through_model tags), with
+    their counts, in name order.
+    """
+    rows = (
+        through_model.objects
+        .filter(content_object__in=pages.values('pk'))
+        .values('tag__name', 'tag__slug')
+        .annotate(count=Count('pk'))
+        .order_by('tag__name')
+    )
+    return [TagFacet(row['tag__name'], row['tag__slug'], row['count']) for row in rows]
+
+
+def tag_facets(through_model, pages, groups, vary):
+    """
+    count_tags, cached in groups for the vary values (which should identify
+    the pages, e.g. by their index page's id).
+    """
+    return cached_value(
+        groups, 'tag_facets', [through_model._meta.label] + list(vary),
+        lambda: count_tags(through_model, pages))
+
+
+def tag_set_key(tags):
+    return hashlib.md5('\n'.join(sorted(tags)).encode('utf-8')).hexdigest()
+
+
+def selected_tags(request):
+    """
+    The tags selected on an index page (?tag=, which may be repeated), and
+    whether pages need all of them ('all', the default) or any ('any', with
+    ?match=any).
+    """
+    tags = sorted(set(tag for tag in request.GET.getlist('tag') if tag))
+    match = 'any' if request.GET.get('match') == 'any' else 'all'
+    return tags, match
+
+
+def filter_by_tags(through_model, pages, tags, match='all'):
+    """
+    The pages with all (or any) of the named tags, found with a single
+    grouped subquery however many tags there are.
+    """
+    tagged = through_model.objects.filter(tag__name__in=tags)
+    if match == 'all':
+        tagged = (
+            tagged.values('content_object')
+            .annotate(matched=Count('tag', distinct=True))
+            .filter(matched=len(tags))
+        )
+    return pages.filter(pk__in=tagged.values('content_object'))
+
+
+def _tag_query(tags, match):
+    query = [('tag', tag) for tag in tags]
+    if match == 'any' and tags:
+        query.append(('match', 'any'))
+    return '?' + urlencode(query)
+
+
+def faceted_pages(request, through_model, pages, groups, vary):
+    """
+    Filter pages by the tags selected in request. The matching pages' ids
+    are cached for each set of tags, and the facets for the result counted
+    in one query (and cached too).
+
+    Returns the filtered pages and the context for
+    utils/includes/tag_facets.html: the selected tags, each with the query
+    string for dropping it, and the other tags with the query string for
+    adding them and their counts (among the pages already matched, if
+    pages need all the tags).
+    """
+    tags, match = selected_tags(request)
+    vary = [through_model._meta.label] + list(vary)
+    key = tag_set_key(tags)
+
+    if tags:
+        page_ids = cached_value(
+            groups, 'tagged_pages', vary + [match, key],
+            lambda: list(filter_by_tags(through_model, pages, tags, match).values_list('pk', flat=True)))
+        filtered_pages = pages.filter(pk__in=page_ids)
+    else:
+        filtered_pages = pages
+
+    if match == 'all':
+        # How many of these pages also have each other tag
+        facets = cached_value(
+            groups, 'tag_facets', vary + [match, key], lambda: count_tags(through_model, filtered_pages))
+    else:
+        # How many pages have each tag, to be added to the union
+        facets = cached_value(groups, 'tag_facets', vary, lambda: count_tags(through_model, pages))
+
+    return filtered_pages, {
+        'selected_tags': [
+            {'name': tag, 'query': _tag_query([other for other in tags if other != tag], match)}
+            for tag in tags
+        ],
+        'tag_facets': [
+            {'name': facet.name, 'count': facet.count, 'query': _tag_query(tags + [facet.name], match)}
+            for facet in facets if facet.name not in tags
+        ],
+        'tag_match': match,
+        'tag_match_query': _tag_query(tags, 'all' if match == 'any' else 'any'),
+    }
@@ -0,0 +1,70 @@
+"""
+Rendered template fragments kept in the Django cache.
+
+Each fragment belongs to one or more groups, named after the content it
+shows (e.g. 'blog'). Clearing a group bumps its version, which changes the
+keys of every fragment in it; the models each group depends on clear it
+from their signal receivers.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+FRAGMENT_VERSION_CACHE_KEY = 'utils:fragment_version:{0}'
+
+
+def fragment_versions(groups):
+    keys = [FRAGMENT_VERSION_CACHE_KEY.format(group) for group in groups]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = uuid.uuid4().hex
+            cache.set(key, versions[key], None)
+    return [versions[key] for key in keys]
+
+
+def clear_fragments(*groups):
+    cache.set_many({
+        FRAGMENT_VERSION_CACHE_KEY.format(group): uuid.uuid4().hex for group in groups
+    }, None)
+
+
+def clear_fragments_on_commit(*groups):
+    """
+    Clear the groups once the current transaction commits, for signal
+    receivers. Cleared any sooner, another request could cache the old
+    content under the new version.
+    """
+    transaction.on_commit(lambda: clear_fragments(*groups))
+
+
+def cached_value(groups, name, vary, get_value):
+    """
+    Return the value cached for name (and the vary values) in the current
+    version of the groups, calling get_value() to calculate it if needed.
+    """
+    key = 'utils:fragment:{0}:{1}:{2}'.format(
+        name, '.'.join(fragment_versions(groups)), ':'.join(str(value) for value in vary))
+    value = cache.get(key)
+    if value is None:
+        value = get_value()
+        cache.set(key, value, FRAGMENT_CACHE_TIMEOUT)
+    return value
+
+
+def render_cached_fragment(template_name, groups, vary, get_context, request):
+    """
+    Render template_name with the context returned by get_context(), unless
+    it has already been rendered for these vary values since the groups
+    were last cleared.
+
+    Fragments are also varied by site, since page URLs are relative to it.
+    """
+    site = getattr(request, 'site', None)
+    return cached_value(
+        groups, template_name, [site and site.pk] + list(vary),
+        lambda: render_to_string(template_name, get_context(), request=request))
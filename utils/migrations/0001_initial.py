@@ -0,0 +1,26 @@
+# Generated by Django 2.0.8 on 2018-09-12 10:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('wagtailcore', '0040_page_draft_title'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderedBody',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('published_at', models.DateTimeField(null=True)),
+                ('html', models.TextField()),
+                ('page', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rendered_body', to='wagtailcore.Page')),
+                ('revision', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='wagtailcore.PageRevision')),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.0.8 on 2018-09-24 10:17
+
+from django.db import migrations, models
+
+
+def clear_rendered_bodies(apps, schema_editor):
+    # Their placeholders have no nonce; they're rendered again when served
+    apps.get_model('utils', 'RenderedBody').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_rendered_bodies, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='renderedbody',
+            name='nonce',
+            field=models.CharField(default='', max_length=32),
+            preserve_default=False,
+        ),
+    ]
@@ -1,11 +1,21 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 
 from wagtail.admin.edit_handlers import (
     FieldPanel, MultiFieldPanel, PageChooserPanel
 )
+from wagtail.contrib.frontend_cache.utils import purge_page_from_cache
 from wagtail.core.fields import RichTextField
+from wagtail.core.models import Page
+from wagtail.core.signals import page_published, page_unpublished
 from wagtail.documents.edit_handlers import DocumentChooserPanel
 from wagtail.images.edit_handlers import ImageChooserPanel
+from wagtail.images.models import AbstractRendition
+
+from .navigation import clear_navigation_tree, clear_page_index
+from .page_cache import purge_site_wide
+from .prerender import prerender_body
 
 
 class LinkFields(models.Model):
@@ -110,3 +120,111 @@ class RelatedLink(LinkFields):
 
     class Meta:
         abstract = True
+
+
+class RenderedBody(models.Model):
+    """
+    The body of a page with a body_template, rendered when it was last
+    published (see utils.prerender).
+    """
+    page = models.OneToOneField(
+        'wagtailcore.Page',
+        on_delete=models.CASCADE,
+        related_name='rendered_body'
+    )
+    revision = models.ForeignKey(
+        'wagtailcore.PageRevision',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+    published_at = models.DateTimeField(null=True)
+    html = models.TextField()
+    # Marks the placeholders for the dynamic blocks in html
+    nonce = models.CharField(max_length=32)
+
+    @classmethod
+    def store(cls, page, revision=None):
+        html, nonce = prerender_body(page)
+        cls.objects.update_or_create(page_id=page.pk, defaults={
+            'revision': revision,
+            'published_at': page.last_published_at,
+            'html': html,
+            'nonce': nonce,
+        })
+        return html, nonce
+
+    @classmethod
+    def clear(cls):
+        """
+        Forget every stored body, e.g. when the page URLs they link to
+        change. They're rendered again as they're served.
+        """
+        cls.objects.all().delete()
+
+
+@receiver(page_published)
+def store_rendered_body(sender, instance, revision=None, **kwargs):
+    if getattr(instance, 'body_template', None) is not None:
+        RenderedBody.store(instance, revision)
+
+
+# Navigation and page caches
+#
+# These are cleared once the change is committed. Clearing them any sooner
+# would let another request rebuild them from the old data, and keep it
+# until the next change.
+
+# Publishing saves over the live page, so keep its live show_in_menus and
+# url_path for clear_navigation_on_publish
+@receiver(pre_save)
+def remember_live_navigation(sender, instance, update_fields=None, **kwargs):
+    if isinstance(instance, Page) and instance.pk is not None and update_fields is None:
+        instance._live_navigation = (
+            Page.objects.filter(pk=instance.pk).values_list('show_in_menus', 'url_path').first())
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def clear_navigation_on_publish(sender, instance, **kwargs):
+    live_show_in_menus, live_url_path = getattr(instance, '_live_navigation', None) or (False, instance.url_path)
+    # The menus show the page if it is (or was, until now) in them
+    in_menus = instance.show_in_menus or live_show_in_menus
+    # Renaming a page changes the URLs of the links to it (and its children)
+    renamed = instance.url_path != live_url_path
+
+    def clear():
+        clear_navigation_tree()
+        clear_page_index()
+        if renamed:
+            RenderedBody.clear()
+
+        # frontend_cache purges the page itself; its parents list it
+        for ancestor in instance.get_ancestors().filter(depth__gt=1):
+            purge_page_from_cache(ancestor)
+        if in_menus:
+            purge_site_wide()
+
+    transaction.on_commit(clear)
+
+
+def clear_navigation():
+    clear_navigation_tree()
+    clear_page_index()
+    RenderedBody.clear()
+    purge_site_wide()
+
+
+# Moving a page saves it as a plain Page, so this also catches moves
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+def clear_navigation_on_change(sender, **kwargs):
+    transaction.on_commit(clear_navigation)
+
+
+# Stored bodies hold the URLs of image renditions
+@receiver(post_delete)
+def clear_rendered_bodies_on_rendition_delete(sender, instance, **kwargs):
+    if isinstance(instance, AbstractRendition):
+        transaction.on_commit(RenderedBody.clear)
@@ -0,0 +1,128 @@
+"""
+Cached indexes of the page tree for navigation.
+
+The navigation tree holds every live page with show_in_menus set, grouped
+under its parent's path, so menus can be rendered without touching the
+database. The page index holds a minimal record of every page by path, for
+breadcrumbs and section menus. Both are built in one query and kept until
+a page is published, unpublished, moved or deleted (see utils.models).
+"""
+import uuid
+
+from django.core.cache import cache
+
+from wagtail.core.models import Page
+
+NAVIGATION_TREE_CACHE_KEY = 'utils:navigation_tree'
+
+
+def build_navigation_tree():
+    """
+    Load the menu pages, returning a dict of lists of pages keyed by their
+    parent's path. Each page's show_dropdown says whether it has menu
+    children of its own.
+    """
+    tree = {}
+    for page in Page.objects.live().filter(show_in_menus=True).order_by('path'):
+        tree.setdefault(page.path[:-page.steplen], []).append(page)
+    for pages in tree.values():
+        for page in pages:
+            page.show_dropdown = page.path in tree
+    return tree
+
+
+def get_navigation_tree(request=None):
+    """
+    Return the navigation tree from the cache, building it if needed. The
+    tree is also kept on the request, so menus rendered together only read
+    the cache once.
+    """
+    tree = getattr(request, '_navigation_tree', None)
+    if tree is None:
+        tree = cache.get(NAVIGATION_TREE_CACHE_KEY)
+        if tree is None:
+            tree = build_navigation_tree()
+            cache.set(NAVIGATION_TREE_CACHE_KEY, tree, None)
+        if request is not None:
+            request._navigation_tree = tree
+    return tree
+
+
+def menu_children(parent, request=None):
+    """
+    The live children of parent that are shown in menus, in tree order.
+    """
+    return get_navigation_tree(request).get(parent.path, [])
+
+
+def clear_navigation_tree():
+    cache.delete(NAVIGATION_TREE_CACHE_KEY)
+
+
+# The page index is kept in each process rather than in the cache, and
+# rebuilt when the version stored in the cache changes.
+PAGE_INDEX_VERSION_CACHE_KEY = 'utils:page_index_version'
+
+PAGE_INDEX_FIELDS = (
+    'id', 'content_type', 'title', 'slug', 'path', 'depth', 'url_path', 'live', 'show_in_menus',
+)
+
+_page_index = (None, None)
+
+
+class PageIndex(object):
+    """
+    Minimal records (Page instances with only PAGE_INDEX_FIELDS loaded) of
+    every page, keyed by their treebeard path, with their children grouped
+    under their parent's path.
+    """
+
+    def __init__(self, pages):
+        self.pages = {}
+        self.children = {}
+        for page in pages:
+            self.pages[page.path] = page
+            self.children.setdefault(page.path[:-page.steplen], []).append(page)
+
+    def ancestors(self, page, inclusive=False, min_depth=1):
+        """
+        The ancestors of page, from the shallowest (at min_depth) down, or
+        None if any of them is missing from the index.
+        """
+        depth = page.depth if inclusive else page.depth - 1
+        paths = [page.path[:page.steplen * d] for d in range(min_depth, depth + 1)]
+        if not all(path in self.pages for path in paths):
+            return None
+        return [self.pages[path] for path in paths]
+
+    def menu_children(self, path):
+        return [page for page in self.children.get(path, []) if page.live and page.show_in_menus]
+
+
+def get_page_index(request=None):
+    """
+    Return this process's page index, rebuilding it with a single query if
+    pages have been published, unpublished, moved or deleted since it was
+    built.
+    """
+    global _page_index
+    index = getattr(request, '_page_index', None)
+    if index is None:
+        version = cache.get(PAGE_INDEX_VERSION_CACHE_KEY)
+        built_version, index = _page_index
+        if index is None or built_version != version:
+            index = PageIndex(Page.objects.only(*PAGE_INDEX_FIELDS).order_by('path'))
+            _page_index = (version, index)
+        if request is not None:
+            request._page_index = index
+    return index
+
+
+def clear_page_index():
+    """
+    Drop this process's page index and tell every other process to rebuild
+    theirs.
+    """
+    global _page_index
+    _page_index = (None, None)
+    cache.set(PAGE_INDEX_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
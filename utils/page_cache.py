@@ -0,0 +1,133 @@
+"""
+A full-page cache for anonymous visitors to Wagtail pages.
+
+Rendered page responses are kept in the Django cache, keyed by site, path
+and the query parameters that change what a page shows
+(PAGE_CACHE_QUERY_PARAMETERS). Only responses served by Wagtail are stored;
+the before_serve_page hook in utils.wagtail_hooks marks them.
+
+As with Django's own cache middleware, there are two halves.
+FetchFromPageCacheMiddleware goes last in MIDDLEWARE, once the site and
+user are known. UpdatePageCacheMiddleware goes first, so the stored
+response has the headers (and any cookies, which stop it being stored)
+that every other middleware adds.
+
+Entries are purged through wagtail.contrib.frontend_cache:
+LocalPageCacheBackend bumps the version of every cached variant of a URL,
+so publishing a page (which frontend_cache purges) and its ancestors
+(see utils.models) takes effect immediately, with or without a CDN.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import urlencode
+from django.utils.six.moves.urllib.parse import urlsplit
+
+from wagtail.contrib.frontend_cache.backends import BaseBackend
+from wagtail.core.models import Site
+
+from .fragments import clear_fragments, fragment_versions
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 10)
+
+PAGE_CACHE_QUERY_PARAMETERS = getattr(
+    settings, 'PAGE_CACHE_QUERY_PARAMETERS', ('page', 'after', 'before', 'tag', 'format', 'month', 'match'))
+
+# Bumped when something shown on every page (e.g. the menus) changes
+SITE_WIDE_GROUP = 'page_cache'
+
+
+def _path_group(site_id, path):
+    return 'page_cache:{0}:{1}'.format(site_id, hashlib.md5(path.encode('utf-8')).hexdigest())
+
+
+def page_cache_key(request):
+    query = urlencode(sorted(
+        (name, value) for name in PAGE_CACHE_QUERY_PARAMETERS for value in request.GET.getlist(name)))
+    versions = fragment_versions([SITE_WIDE_GROUP, _path_group(request.site.pk, request.path)])
+    return 'utils:page_cache:{0}:{1}:{2}'.format(
+        '.'.join(versions), request.method, hashlib.md5(
+            '{0}?{1}'.format(request.path, query).encode('utf-8')).hexdigest())
+
+
+def is_cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD') and
+        getattr(request, 'site', None) is not None and
+        not request.user.is_authenticated
+    )
+
+
+def is_cacheable_response(request, response):
+    return (
+        getattr(request, 'page_cache_page', None) is not None and
+        response.status_code == 200 and
+        not response.streaming and
+        not response.cookies and
+        # The page used a CSRF token (e.g. a form), which is per visitor
+        not request.META.get('CSRF_COOKIE_USED') and
+        'private' not in response.get('Cache-Control', '')
+    )
+
+
+class FetchFromPageCacheMiddleware(object):
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if is_cacheable_request(request):
+            key = page_cache_key(request)
+            response = cache.get(key)
+            if response is not None:
+                return response
+            # Tells UpdatePageCacheMiddleware to store the response
+            request.page_cache_key = key
+        return self.get_response(request)
+
+
+class UpdatePageCacheMiddleware(object):
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, 'page_cache_key', None)
+        if key is not None and is_cacheable_response(request, response):
+            cache.set(key, response, PAGE_CACHE_TIMEOUT)
+        return response
+
+
+def purge_url(url):
+    """
+    Forget every cached variant of the page at this (absolute) URL.
+    """
+    url = urlsplit(url)
+    root_url = '{0}://{1}'.format(url.scheme, url.netloc)
+    for site_id, root_path, site_root_url in Site.get_site_root_paths():
+        if site_root_url == root_url:
+            clear_fragments(_path_group(site_id, url.path))
+
+
+def purge_site_wide():
+    """
+    Forget every cached page, e.g. when the menus change.
+    """
+    clear_fragments(SITE_WIDE_GROUP)
+
+
+class LocalPageCacheBackend(BaseBackend):
+    """
+    A wagtail.contrib.frontend_cache backend that purges the page cache's
+    entries. It needs no CDN, so it can be used alongside (or instead of)
+    one, and in tests.
+    """
+
+    def __init__(self, params):
+        self.params = params
+
+    def purge(self, url):
+        # Wagtail purges pages as they're published, before the transaction
+        # commits; purged sooner, the old page could be cached again
+        transaction.on_commit(lambda: purge_url(url))
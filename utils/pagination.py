@@ -0,0 +1,193 @@
+"""
+Keyset (cursor) pagination for index pages.
+
+Rather than counting every row and skipping to an offset, each page picks
+up from the sort key of the last item on the page before, passed as an
+opaque ?after= (or, going back, ?before=) token. Deep pages cost the same as
+the first, as long as the ordering ends in a unique field such as id.
+"""
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class TokenEncoder(DjangoJSONEncoder):
+    """
+    Keeps the microseconds of datetimes and times, which DjangoJSONEncoder
+    drops, so a token matches the row it was made from exactly.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super(TokenEncoder, self).default(o)
+
+
+def encode_token(values):
+    return base64.urlsafe_b64encode(
+        json.dumps(values, cls=TokenEncoder).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_token(token, model=None, ordering=None):
+    """
+    Return the sort key in token, or None if it isn't a valid token.
+
+    Given the model and ordering it's for, the key must have a value for
+    each field in ordering, and the values are converted by those fields
+    (so a token can't put values of the wrong type into a query).
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8'))
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list):
+        return None
+    if model is None:
+        return values
+
+    if len(values) != len(ordering):
+        return None
+    try:
+        values = [
+            model._meta.get_field(field.lstrip('-')).to_python(value)
+            for field, value in zip(ordering, values)
+        ]
+    except (ValidationError, TypeError, ValueError):
+        return None
+    return None if None in values else values
+
+
+def clean_token(token, model, ordering):
+    """
+    Return token re-encoded from its sort key, or None if it isn't a valid
+    token for model and ordering, e.g. so only real tokens are used in cache
+    keys.
+    """
+    values = token and decode_token(token, model, ordering)
+    if not values:
+        return None
+    return encode_token(values)
+
+
+def _keyset_filter(ordering, values, forwards=True):
+    """
+    Build the filter for rows that sort after (or before) the given key,
+    e.g. for ('-date', 'id'): date < d OR (date = d AND id > i).
+    """
+    condition = Q()
+    for i in reversed(range(len(ordering))):
+        field = ordering[i].lstrip('-')
+        descending = ordering[i].startswith('-')
+        lookup = 'lt' if descending == forwards else 'gt'
+        beyond = Q(**{'{0}__{1}'.format(field, lookup): values[i]})
+        if i < len(ordering) - 1:
+            beyond |= Q(**{field: values[i]}) & condition
+        condition = beyond
+    return condition
+
+
+def _reverse(ordering):
+    return [field[1:] if field.startswith('-') else '-' + field for field in ordering]
+
+
+class KeysetPage(object):
+    """
+    One page of a keyset-paginated queryset. Like a Paginator page it can be
+    iterated, with has_previous/has_next; next_token and previous_token
+    are the tokens for the neighbouring pages.
+
+    count is the number of items across every page, calculated only if used
+    (by calling the count function given, which may be cached).
+    """
+
+    def __init__(self, object_list, ordering, has_previous, has_next, count=None):
+        self.object_list = object_list
+        self.ordering = ordering
+        self._has_previous = has_previous
+        self._has_next = has_next
+        self._count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def _token(self, item):
+        return encode_token([getattr(item, field.lstrip('-')) for field in self.ordering])
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    @property
+    def previous_token(self):
+        return self._token(self.object_list[0]) if self._has_previous else None
+
+    @property
+    def next_token(self):
+        return self._token(self.object_list[-1]) if self._has_next else None
+
+    @cached_property
+    def count(self):
+        return self._count() if self._count is not None else None
+
+
+def keyset_page(queryset, ordering, per_page, after=None, before=None, count=None):
+    """
+    Return the page of queryset, sorted by ordering, that follows the after
+    token or precedes the before token (or the first page with neither).
+    """
+    ordering = list(ordering)
+    # Invalid tokens are ignored, giving the first page
+    after = after and decode_token(after, queryset.model, ordering)
+    before = before and decode_token(before, queryset.model, ordering)
+
+    if before:
+        items = list(queryset.filter(_keyset_filter(ordering, before, forwards=False))
+                     .order_by(*_reverse(ordering))[:per_page + 1])
+        has_previous = len(items) > per_page
+        items = items[:per_page][::-1]
+        return KeysetPage(items, ordering, has_previous, True, count)
+
+    has_previous = False
+    if after:
+        queryset = queryset.filter(_keyset_filter(ordering, after))
+        has_previous = True
+    items = list(queryset.order_by(*ordering)[:per_page + 1])
+    return KeysetPage(items[:per_page], ordering, has_previous, len(items) > per_page, count)
+
+
+def paginate(request, queryset, ordering, per_page, count=None):
+    """
+    Paginate queryset for an index page. Links with a ?page= number still
+    get a numbered Paginator page; otherwise the page is found by keyset
+    from the ?after= or ?before= token.
+    """
+    page = request.GET.get('page')
+    if page is not None:
+        paginator = Paginator(queryset.order_by(*ordering), per_page)
+        try:
+            return paginator.page(page)
+        except PageNotAnInteger:
+            return paginator.page(1)
+        except EmptyPage:
+            return paginator.page(paginator.num_pages)
+
+    return keyset_page(
+        queryset, ordering, per_page,
+        after=request.GET.get('after'), before=request.GET.get('before'), count=count)
@@ -0,0 +1,73 @@
+"""
+Body StreamFields rendered to HTML ahead of time.
+
+Pages with a body_template (the template that renders their body) have it
+rendered when they're published, and the HTML stored in a RenderedBody
+(see utils.models). Serving them then reads that instead of rendering each
+block again.
+
+Blocks whose output depends on the request or on other pages, such as the
+concordance characteristics blocks, set dynamic = True in their Meta. They
+are left as placeholders in the stored HTML and rendered on each request.
+The placeholders include a random nonce, stored alongside the HTML, so
+content that happens to look like one isn't taken for one.
+
+The stored HTML also holds the URLs of the pages and images it links to,
+so it is dropped (and rendered again when next served) whenever pages
+move or are renamed, or renditions are deleted.
+"""
+import re
+import uuid
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+DYNAMIC_BLOCK_PLACEHOLDER = '<!-- prerendered body {0}: dynamic block {1} -->'
+
+
+def is_dynamic(block):
+    return getattr(block.meta, 'dynamic', False)
+
+
+class DynamicBlockPlaceholder(object):
+    """
+    Stands in for a dynamic block of a body while it is prerendered.
+    """
+
+    def __init__(self, child, index, nonce):
+        self.block_type = child.block_type
+        self.index = index
+        self.nonce = nonce
+
+    def render_as_block(self, context=None):
+        return mark_safe(DYNAMIC_BLOCK_PLACEHOLDER.format(self.nonce, self.index))
+
+
+def prerender_body(page):
+    """
+    Render page's body with its body_template, leaving placeholders for the
+    dynamic blocks. Returns the HTML and the nonce in its placeholders.
+    """
+    nonce = uuid.uuid4().hex
+    body = [
+        DynamicBlockPlaceholder(child, index, nonce) if is_dynamic(child.block) else child
+        for index, child in enumerate(page.body)
+    ]
+    return render_to_string(page.body_template, {'body': body}), nonce
+
+
+def render_dynamic_blocks(page, html, nonce, context):
+    """
+    Fill in the placeholders in page's prerendered body html, rendering the
+    dynamic blocks with the template context.
+    """
+    before, after = DYNAMIC_BLOCK_PLACEHOLDER.format(nonce, '{0}').split('{0}')
+    parts = re.split(re.escape(before) + r'(\d+)' + re.escape(after), html)
+    if len(parts) > 1:
+        block_context = context.flatten()
+        for i in range(1, len(parts), 2):
+            index = int(parts[i])
+            # The body is of the version the HTML was rendered from, but
+            # don't trust that
+            parts[i] = page.body[index].render_as_block(block_context) if index < len(page.body) else ''
+    return mark_safe(''.join(parts))
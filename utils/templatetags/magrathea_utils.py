@@ -1,4 +1,6 @@
 from django import template
+from django.db.models import Q
+from django.utils.safestring import mark_safe
 from datetime import date
 from wagtail.documents.models import Document
 from contact.models import ContactPage
@@ -6,11 +8,19 @@ from blog.models import BlogPage
 from events.models import EventPage
 from pages.models import Testimonial, Advert
 
+from ..fragments import cached_value, render_cached_fragment
+from ..models import RenderedBody
+from ..prerender import prerender_body, render_dynamic_blocks
+
 register = template.Library()
 
 
 @register.simple_tag(takes_context=True)
 def get_contact_fields(context):
+    return cached_value(['contact'], 'contact_fields', [], _get_contact_fields)
+
+
+def _get_contact_fields():
     try:
         contact_vals = ContactPage.objects.values(
             'name_organization', 'address_1',
@@ -22,50 +32,60 @@ def get_contact_fields(context):
         return {}
 
 
-@register.inclusion_tag(
-    'documents_gallery/includes/documents_listing.html', takes_context=True)
+@register.simple_tag(takes_context=True)
 def latest_documents(context, count=5):
-
-    documents = Document.objects.order_by('-created_at')
-    return {
-        'documents': documents[:count],
-        'request': context['request'],
-    }
+    def get_context():
+        documents = Document.objects.order_by('-created_at')
+        return {
+            'documents': documents[:count],
+            'request': context['request'],
+        }
+    return mark_safe(render_cached_fragment(
+        'documents_gallery/includes/documents_listing.html', ['documents'], [count],
+        get_context, context['request']))
 
 
-@register.inclusion_tag('blog/includes/blog_post_listing.html',
-                        takes_context=True)
+@register.simple_tag(takes_context=True)
 def news_feed(context, count=2):
-    blogs = BlogPage.objects.filter(live=True).order_by('-date')
-    return {
-        'blogs': blogs[:count],
-        # required by the pageurl tag that we want to use within this template
-        'request': context['request'],
-    }
+    def get_context():
+        blogs = BlogPage.objects.filter(live=True).order_by('-date')
+        return {
+            'blogs': blogs[:count],
+            # required by the pageurl tag that we want to use within this template
+            'request': context['request'],
+        }
+    return mark_safe(render_cached_fragment(
+        'blog/includes/blog_post_listing.html', ['blog'], [count], get_context, context['request']))
 
 
-@register.inclusion_tag('blog/includes/blog_more_list.html', takes_context=True)
+@register.simple_tag(takes_context=True)
 def more_news(context, count=2):
-    blogs = BlogPage.objects.filter(live=True).order_by('-date')
-    return {
-        'blogs': blogs[:count],
-        # required by the pageurl tag that we want to use within this template
-        'request': context['request'],
-    }
+    def get_context():
+        blogs = BlogPage.objects.filter(live=True).order_by('-date')
+        return {
+            'blogs': blogs[:count],
+            # required by the pageurl tag that we want to use within this template
+            'request': context['request'],
+        }
+    return mark_safe(render_cached_fragment(
+        'blog/includes/blog_more_list.html', ['blog'], [count], get_context, context['request']))
 
 
-@register.inclusion_tag('events/includes/event_listing.html',
-                        takes_context=True)
+@register.simple_tag(takes_context=True)
 def upcoming_events(context, count=3):
+    today = date.today()
 
-    events = EventPage.objects.filter(live=True)
-    events = events.filter(date_from__gte=date.today())
-    events = events.all().order_by('date_from')
-    return {
-        'events': events[:count],
-        # required by the pageurl tag that we want to use within this template
-        'request': context['request'],
-    }
+    def get_context():
+        events = EventPage.objects.live().upcoming()
+        events = events.order_by('date_from')
+        return {
+            'events': events[:count],
+            # required by the pageurl tag that we want to use within this template
+            'request': context['request'],
+        }
+    # Varying by the date drops events that have passed at midnight
+    return mark_safe(render_cached_fragment(
+        'events/includes/event_listing.html', ['events'], [count, today], get_context, context['request']))
 
 
 @register.filter
@@ -103,37 +123,101 @@ def time_display(time):
     return "".join([hour_string, minute_string, pm_string])
 
 
-@register.inclusion_tag('pages/includes/testimonials.html', takes_context=True)
+# Only the relations the snippet templates use
+TESTIMONIAL_RELATIONS = ('photo', 'link_page', 'link_document')
+ADVERT_RELATIONS = ('image', 'link_page', 'link_document')
+
+
+def page_and_shared_snippets(queryset, page, group, request):
+    """
+    Split snippets into those attached to page and those attached to no
+    page. The shared ones are the same everywhere, so they're cached per
+    site until the group is cleared; on a miss both sets come from one
+    query.
+    """
+    fetched = {}
+
+    def get_shared():
+        snippets = list(queryset.filter(Q(page=page) | Q(page__isnull=True)))
+        fetched['page'] = [snippet for snippet in snippets if snippet.page_id == page.pk]
+        return [snippet for snippet in snippets if snippet.page_id is None]
+
+    site = getattr(request, 'site', None)
+    shared = cached_value(
+        [group], '{0}_without_page'.format(queryset.model._meta.model_name), [site and site.pk], get_shared)
+    if 'page' in fetched:
+        return fetched['page'], shared
+    return list(queryset.filter(page=page)), shared
+
+
+@register.simple_tag(takes_context=True)
 def testimonials(context):
     the_page = context['page']
-    all_testimonials = Testimonial.objects.select_related()
-    return {
-        'page_testimonials': all_testimonials.filter(page=the_page),
-        'non_page_associated_testimonials': all_testimonials.filter(page__isnull=True),
-        'testimonials': all_testimonials,
-        'request': context['request'],
-    }
 
+    def get_context():
+        page_testimonials, non_page_associated_testimonials = page_and_shared_snippets(
+            Testimonial.objects.select_related(*TESTIMONIAL_RELATIONS), the_page, 'testimonials', context['request'])
+        return {
+            'page_testimonials': page_testimonials,
+            'non_page_associated_testimonials': non_page_associated_testimonials,
+            'testimonials': page_testimonials + non_page_associated_testimonials,
+            'request': context['request'],
+        }
+    return mark_safe(render_cached_fragment(
+        'pages/includes/testimonials.html', ['testimonials'], [the_page.pk], get_context, context['request']))
 
-@register.inclusion_tag('pages/includes/testimonials_list.html', takes_context=True)
+
+@register.simple_tag(takes_context=True)
 def testimonials_list(context):
     the_page = context['page']
-    all_testimonials = Testimonial.objects.select_related()
-    return {
-        'page_testimonials': all_testimonials.filter(page=the_page),
-        'non_page_associated_testimonials': all_testimonials.filter(page__isnull=True),
-        'testimonials': all_testimonials,
-        'request': context['request'],
-    }
+
+    def get_context():
+        all_testimonials = list(Testimonial.objects.select_related(*TESTIMONIAL_RELATIONS))
+        return {
+            'page_testimonials': [t for t in all_testimonials if t.page_id == the_page.pk],
+            'non_page_associated_testimonials': [t for t in all_testimonials if t.page_id is None],
+            'testimonials': all_testimonials,
+            'request': context['request'],
+        }
+    return mark_safe(render_cached_fragment(
+        'pages/includes/testimonials_list.html', ['testimonials'], [the_page.pk], get_context, context['request']))
 
 
-@register.inclusion_tag('pages/includes/adverts.html', takes_context=True)
+@register.simple_tag(takes_context=True)
 def adverts(context):
     the_page = context['page']
-    all_adverts = Advert.objects.select_related()
-    return {
-        'page_advert': all_adverts.filter(page=the_page),
-        'non_page_associated_adverts': all_adverts.filter(page__isnull=True),
-        'adverts': all_adverts,
-        'request': context['request'],
-    }
+
+    def get_context():
+        page_advert, non_page_associated_adverts = page_and_shared_snippets(
+            Advert.objects.select_related(*ADVERT_RELATIONS), the_page, 'adverts', context['request'])
+        return {
+            'page_advert': page_advert,
+            'non_page_associated_adverts': non_page_associated_adverts,
+            'adverts': page_advert + non_page_associated_adverts,
+            'request': context['request'],
+        }
+    return mark_safe(render_cached_fragment(
+        'pages/includes/adverts.html', ['adverts'], [the_page.pk], get_context, context['request']))
+
+
+@register.simple_tag(takes_context=True)
+def body_html(context, page):
+    """
+    Render page's body from the HTML stored when it was published, if that
+    is of the version being shown. Previews and pages published before
+    bodies were stored are rendered in full (and stored, for live pages).
+    """
+    request = context.get('request')
+    is_preview = getattr(request, 'is_preview', False)
+    rendered = None
+    if not is_preview:
+        rendered = RenderedBody.objects.filter(
+            page_id=page.pk, published_at=page.last_published_at
+        ).values_list('html', 'nonce').first()
+    if rendered is None:
+        if page.live and not is_preview:
+            rendered = RenderedBody.store(page)
+        else:
+            rendered = prerender_body(page)
+    html, nonce = rendered
+    return render_dynamic_blocks(page, html, nonce, context)
@@ -1,5 +1,7 @@
 from django import template
 from wagtail.core.models import Page
+
+from ..navigation import get_page_index, menu_children
 register = template.Library()
 
 
@@ -8,22 +10,11 @@ def get_site_root(context):
     return context['request'].site.root_page
 
 
-def has_menu_children(page):
-    if page.get_children().filter(live=True, show_in_menus=True):
-        return True
-    else:
-        return False
-
-
 @register.inclusion_tag(
     'utils/tags/navigation/top_menu.html', takes_context=True)
 def top_menu(context, parent, calling_page=None):
-    menuitems = parent.get_children().filter(
-        live=True,
-        show_in_menus=True
-    )
-    for menuitem in menuitems:
-        menuitem.show_dropdown = has_menu_children(menuitem)
+    # show_dropdown is set on every page in the navigation tree
+    menuitems = menu_children(parent, context['request'])
     return {
         'calling_page': calling_page,
         'menuitems': menuitems,
@@ -35,13 +26,7 @@ def top_menu(context, parent, calling_page=None):
 @register.inclusion_tag(
     'utils/tags/navigation/top_menu_children.html', takes_context=True)
 def top_menu_children(context, parent):
-    menuitems_children = parent.get_children()
-    menuitems_children = menuitems_children.filter(
-        live=True,
-        show_in_menus=True
-    )
-    for menuitem in menuitems_children:
-        menuitem.show_dropdown = has_menu_children(menuitem)
+    menuitems_children = menu_children(parent, context['request'])
     return {
         'parent': parent,
         'menuitems_children': menuitems_children,
@@ -53,12 +38,7 @@ def top_menu_children(context, parent):
 @register.inclusion_tag(
     'utils/tags/navigation/site_menu.html', takes_context=True)
 def site_menu(context, parent, calling_page=None):
-    menuitems = parent.get_children().filter(
-        live=True,
-        show_in_menus=True
-    )
-    for menuitem in menuitems:
-        menuitem.show_dropdown = has_menu_children(menuitem)
+    menuitems = menu_children(parent, context['request'])
     return {
         'calling_page': calling_page,
         'menuitems': menuitems,
@@ -69,13 +49,7 @@ def site_menu(context, parent, calling_page=None):
 @register.inclusion_tag(
     'utils/tags/navigation/site_menu_children.html', takes_context=True)
 def site_menu_children(context, parent):
-    menuitems_children = parent.get_children()
-    menuitems_children = menuitems_children.filter(
-        live=True,
-        show_in_menus=True
-    )
-    for menuitem in menuitems_children:
-        menuitem.show_dropdown = has_menu_children(menuitem)
+    menuitems_children = menu_children(parent, context['request'])
     return {
         'parent': parent,
         'menuitems_children': menuitems_children,
@@ -84,22 +58,21 @@ def site_menu_children(context, parent):
     }
 
 
+def section_menu_pages(page, request=None):
+    """
+    The menu pages beneath page or, if it has none, those alongside it.
+    """
+    index = get_page_index(request)
+    return (index.menu_children(page.path) or
+            index.menu_children(page.path[:-page.steplen]))
+
+
 @register.inclusion_tag(
     'utils/tags/navigation/secondary_menu.html', takes_context=True)
 def secondary_menu(context, calling_page=None):
     pages = []
     if calling_page:
-        pages = calling_page.get_children().filter(
-            live=True,
-            show_in_menus=True
-        )
-
-        # If no children, get siblings instead
-        if len(pages) == 0:
-            pages = calling_page.get_siblings().filter(
-                live=True,
-                show_in_menus=True
-            )
+        pages = section_menu_pages(calling_page, context['request'])
     return {
         'pages': pages,
         # required by the pageurl tag that we want to use within this template
@@ -112,17 +85,7 @@ def secondary_menu(context, calling_page=None):
 def secondary_menu_grid(context, calling_page=None):
     pages = []
     if calling_page:
-        pages = calling_page.get_children().filter(
-            live=True,
-            show_in_menus=True
-        )
-
-        # If no children, get siblings instead
-        if len(pages) == 0:
-            pages = calling_page.get_siblings().filter(
-                live=True,
-                show_in_menus=True
-            )
+        pages = section_menu_pages(calling_page, context['request'])
     return {
         'pages': pages,
         # required by the pageurl tag that we want to use within this template
@@ -138,8 +101,12 @@ def breadcrumbs(context):
         # When on the home page, displaying breadcrumbs is irrelevant.
         ancestors = ()
     else:
-        ancestors = Page.objects.ancestor_of(
-            self, inclusive=True).filter(depth__gt=2)
+        ancestors = get_page_index(context['request']).ancestors(
+            self, inclusive=True, min_depth=3)
+        if ancestors is None:
+            # e.g. previewing a page that hasn't been saved yet
+            ancestors = Page.objects.ancestor_of(
+                self, inclusive=True).filter(depth__gt=2)
     return {
         'ancestors': ancestors,
         'request': context['request'],
@@ -149,12 +116,7 @@ def breadcrumbs(context):
 @register.inclusion_tag(
     'utils/tags/navigation/offcanvas_top_menu.html', takes_context=True)
 def offcanvas_top_menu(context, parent, calling_page=None):
-    menuitems = parent.get_children().filter(
-        live=True,
-        show_in_menus=True
-    )
-    for menuitem in menuitems:
-        menuitem.show_dropdown = has_menu_children(menuitem)
+    menuitems = menu_children(parent, context['request'])
     return {
         'calling_page': calling_page,
         'menuitems': menuitems,
@@ -168,13 +130,7 @@ def offcanvas_top_menu(context, parent, calling_page=None):
     takes_context=True
     )
 def offcanvas_top_menu_children(context, parent):
-    menuitems_children = parent.get_children()
-    menuitems_children = menuitems_children.filter(
-        live=True,
-        show_in_menus=True
-    )
-    for menuitem in menuitems_children:
-        menuitem.show_dropdown = has_menu_children(menuitem)
+    menuitems_children = menu_children(parent, context['request'])
     return {
         'parent': parent,
         'menuitems_children': menuitems_children,
@@ -0,0 +1,166 @@
+from datetime import datetime
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.template import Context
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from wagtail.core.models import Page, Site
+from wagtail.documents.models import Document
+
+from .facets import selected_tags, tag_set_key
+from .page_cache import (
+    FetchFromPageCacheMiddleware, LocalPageCacheBackend, UpdatePageCacheMiddleware, page_cache_key
+)
+from .pagination import clean_token, decode_token, encode_token, keyset_page
+from .prerender import DYNAMIC_BLOCK_PLACEHOLDER, render_dynamic_blocks
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PageCacheTests(TestCase):
+    def get_request(self, path, data=None):
+        request = RequestFactory().get(path, data)
+        request.site = Site.objects.get(is_default_site=True)
+        request.user = AnonymousUser()
+        return request
+
+    def test_key_ignores_other_parameters(self):
+        self.assertEqual(
+            page_cache_key(self.get_request('/', {'page': 2, 'utm_source': 'feed'})),
+            page_cache_key(self.get_request('/', {'page': 2})))
+        self.assertNotEqual(
+            page_cache_key(self.get_request('/', {'page': 2})),
+            page_cache_key(self.get_request('/', {'page': 3})))
+
+    def test_middleware_stores_and_serves_pages(self):
+        def serve_page(request):
+            request.page_cache_page = Page.objects.get(depth=2)
+            return HttpResponse('page')
+
+        def fail(request):
+            raise AssertionError("The page should have been served from the cache")
+
+        UpdatePageCacheMiddleware(FetchFromPageCacheMiddleware(serve_page))(self.get_request('/'))
+        response = UpdatePageCacheMiddleware(FetchFromPageCacheMiddleware(fail))(self.get_request('/'))
+        self.assertEqual(response.content, b'page')
+
+    def test_local_backend_purges_url(self):
+        home_key = page_cache_key(self.get_request('/'))
+        other_key = page_cache_key(self.get_request('/other/'))
+        site = Site.objects.get(is_default_site=True)
+        with mock.patch('utils.page_cache.transaction.on_commit') as on_commit:
+            LocalPageCacheBackend({}).purge(site.root_url + '/')
+            # Nothing is purged until the transaction commits
+            self.assertEqual(home_key, page_cache_key(self.get_request('/')))
+            on_commit.call_args[0][0]()
+        self.assertNotEqual(home_key, page_cache_key(self.get_request('/')))
+        self.assertEqual(other_key, page_cache_key(self.get_request('/other/')))
+
+
+class NavigationClearingTests(TestCase):
+    def test_hiding_page_from_menus_purges_site_after_commit(self):
+        Page.objects.filter(depth=2).update(show_in_menus=True)
+        page = Page.objects.get(depth=2).specific
+        page.show_in_menus = False
+
+        # TestCase never commits, so the on_commit callbacks are collected
+        # and run by hand
+        with mock.patch('utils.models.transaction.on_commit') as on_commit, \
+                mock.patch('utils.models.purge_site_wide') as purge_site_wide:
+            page.save_revision().publish()
+            purge_site_wide.assert_not_called()
+            for call in on_commit.call_args_list:
+                call[0][0]()
+
+        purge_site_wide.assert_called_with()
+
+
+class KeysetPaginationTests(TestCase):
+    def test_token_round_trip(self):
+        self.assertEqual(decode_token(encode_token(['2018-01-01', 3])), ['2018-01-01', 3])
+        self.assertIsNone(decode_token('not a token'))
+
+    def test_pages_follow_on(self):
+        pages = list(Page.objects.order_by('path'))
+        first = keyset_page(Page.objects.all(), ('path',), 1)
+        self.assertEqual(list(first), pages[:1])
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+
+        second = keyset_page(Page.objects.all(), ('path',), 1, after=first.next_token)
+        self.assertEqual(list(second), pages[1:2])
+        self.assertTrue(second.has_previous())
+
+        back = keyset_page(Page.objects.all(), ('path',), 1, before=second.previous_token)
+        self.assertEqual(list(back), pages[:1])
+        self.assertFalse(back.has_previous())
+
+    def test_datetime_keys_keep_microseconds(self):
+        # These differ only below the millisecond
+        created_at = datetime(2018, 9, 1, 12, 0, 0, tzinfo=timezone.utc)
+        for microsecond in (123900, 123600, 123300):
+            document = Document.objects.create(title=str(microsecond), file='documents/example.pdf')
+            Document.objects.filter(pk=document.pk).update(created_at=created_at.replace(microsecond=microsecond))
+        documents = list(Document.objects.order_by('-created_at', '-id'))
+        ordering = ('-created_at', '-id')
+
+        second = keyset_page(Document.objects.all(), ordering, 1, after=encode_token(
+            [documents[0].created_at, documents[0].pk]))
+        self.assertEqual(list(second), documents[1:2])
+
+        third = keyset_page(Document.objects.all(), ordering, 1, after=second.next_token)
+        self.assertEqual(list(third), documents[2:3])
+
+        back = keyset_page(Document.objects.all(), ordering, 1, before=third.previous_token)
+        self.assertEqual(list(back), documents[1:2])
+
+    def test_clean_token(self):
+        ordering = ('-created_at', '-id')
+        created_at = datetime(2018, 9, 1, 12, 0, 0, 123900, tzinfo=timezone.utc)
+        token = encode_token([created_at, 3])
+        self.assertEqual(clean_token(token, Document, ordering), token)
+        # Values are converted by their fields
+        self.assertEqual(clean_token(encode_token([created_at, '3']), Document, ordering), token)
+        self.assertIsNone(clean_token(token, Page, ('path',)))
+        self.assertIsNone(clean_token('not a token', Page, ('path',)))
+        self.assertIsNone(clean_token(None, Page, ('path',)))
+        # Values that aren't of the fields' types
+        self.assertIsNone(clean_token(encode_token(['x', 'y']), Document, ordering))
+        self.assertIsNone(clean_token(encode_token([[1], [2]]), Document, ordering))
+        self.assertIsNone(clean_token(encode_token([None, 3]), Document, ordering))
+
+    def test_invalid_values_give_first_page(self):
+        page = keyset_page(Document.objects.all(), ('-created_at', '-id'), 1, after=encode_token(['x', 'y']))
+        self.assertFalse(page.has_previous())
+
+
+class TagFilterTests(TestCase):
+    def test_selected_tags(self):
+        request = RequestFactory().get('/', {'tag': ['moons', 'gas giants', 'moons', ''], 'match': 'any'})
+        self.assertEqual(selected_tags(request), (['gas giants', 'moons'], 'any'))
+        self.assertEqual(selected_tags(RequestFactory().get('/', {'tag': 'moons'})), (['moons'], 'all'))
+
+    def test_tag_set_key_ignores_order(self):
+        self.assertEqual(tag_set_key(['moons', 'rings']), tag_set_key(['rings', 'moons']))
+
+
+class DynamicBlock(object):
+    def render_as_block(self, context=None):
+        return 'dynamic'
+
+
+class PrerenderTests(SimpleTestCase):
+    def test_only_placeholders_with_nonce_are_filled(self):
+        page = mock.Mock(body=[DynamicBlock()])
+        html = ''.join([
+            DYNAMIC_BLOCK_PLACEHOLDER.format('nonce', 0),
+            # In the content, e.g. a raw HTML block
+            DYNAMIC_BLOCK_PLACEHOLDER.format('other', 0),
+            DYNAMIC_BLOCK_PLACEHOLDER.format('nonce', 5),
+        ])
+        self.assertEqual(
+            render_dynamic_blocks(page, html, 'nonce', Context()),
+            'dynamic' + DYNAMIC_BLOCK_PLACEHOLDER.format('other', 0))
+
@@ -0,0 +1,9 @@
+from wagtail.core import hooks
+
+
+@hooks.register('before_serve_page')
+def mark_page_for_caching(page, request, serve_args, serve_kwargs):
+    # Lets utils.page_cache.UpdatePageCacheMiddleware know the response is a page,
+    # unless the page has view restrictions (passwords or logins)
+    if not page.get_view_restrictions().exists():
+        request.page_cache_page = page